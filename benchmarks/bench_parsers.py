@@ -0,0 +1,56 @@
+"""Pages/sec per core for each installed parser backend.
+
+Runs each spider's parse-once path (parse, extract items, find the next link)
+on the saved fixture pages in a single thread:
+
+    python -m benchmarks.bench_parsers [--seconds 2]
+
+The fixtures in `benchmarks/fixtures/` reproduce the markup of page 1 of
+quotes.toscrape.com and books.toscrape.com.
+"""
+import argparse
+import os
+import time
+
+from src.scraper.spiders.books_spider import BooksSpider
+from src.scraper.spiders.parsers import available_backends
+from src.scraper.spiders.quotes_spider import QuotesSpider
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _spiders(backend):
+    return {
+        "quotes": (QuotesSpider(parser=backend), "quotes_page1.html", "https://quotes.toscrape.com/"),
+        "books": (BooksSpider(parser=backend, download_images=False), "books_page1.html", "https://books.toscrape.com/"),
+    }
+
+
+def bench(spider, html, url, seconds):
+    pages, items = 0, 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        doc = spider.parser.parse(html)
+        items += sum(1 for _ in spider.extract_items(doc, url))
+        spider.next_page(doc, url)
+        pages += 1
+    return pages / (time.perf_counter() - started), items // max(pages, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time budget per backend and page")
+    args = parser.parse_args()
+
+    print(f"{'backend':<12} {'page':<8} {'pages/s':>10} {'items/page':>11}")
+    for backend in available_backends():
+        for name, (spider, fixture, url) in _spiders(backend).items():
+            with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as fh:
+                html = fh.read()
+            rate, per_page = bench(spider, html, url, args.seconds)
+            print(f"{backend:<12} {name:<8} {rate:>10.1f} {per_page:>11}")
+
+
+if __name__ == "__main__":
+    main()
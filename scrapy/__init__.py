@@ -8,8 +8,9 @@ Scrapy isn't installed.
 If you have Scrapy installed and prefer the real package, remove or rename
 this folder so the system package is used instead.
 """
-from dataclasses import dataclass
-from typing import Any, Generator, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, Iterable, Optional
+from urllib.parse import urljoin
 
 
 class Spider:
@@ -34,16 +35,37 @@ class Spider:
         return
 
 
+@dataclass
+class Request:
+    """A URL to fetch, optionally with the callback that parses its response.
+
+    Spiders may yield these from `parse` to queue follow-up pages; without a
+    callback the spider's `parse` is used.
+    """
+
+    url: str
+    callback: Optional[Callable[..., Any]] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+    dont_filter: bool = False
+
+
 @dataclass
 class Response:
     url: str
     status: int
     text: str
+    meta: Dict[str, Any] = field(default_factory=dict)
 
     # compatibility alias expected by spiders
     @property
     def body(self) -> bytes:
         return self.text.encode("utf-8")
 
+    def urljoin(self, url: str) -> str:
+        return urljoin(self.url, url)
+
+    def follow(self, url: str, callback: Optional[Callable[..., Any]] = None, **kwargs) -> Request:
+        return Request(url=self.urljoin(url), callback=callback, **kwargs)
+
 
-__all__ = ["Spider", "Response"]
+__all__ = ["Spider", "Request", "Response"]
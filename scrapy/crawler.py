@@ -1,22 +1,42 @@
 """Minimal CrawlerProcess shim used for local development/testing.
 
-This will perform simple HTTP GETs for each start URL and call the spider's
-`parse` method with a small `Response` object. It's intentionally tiny and
-does not implement Scrapy features like concurrency, middlewares, pipelines,
-or request scheduling.
+Start URLs are fetched by a small asyncio engine built on `httpx`:
+
+* a global limit of ``CONCURRENT_REQUESTS`` in-flight requests;
+* at most ``CONCURRENT_REQUESTS_PER_DOMAIN`` per host, with ``DOWNLOAD_DELAY``
+  seconds between request starts to the same host;
+* one pooled keep-alive ``httpx.AsyncClient`` shared by all requests, and
+  optionally across runs: a long-lived caller passes its own event loop and
+  a client from `open_client` to `start`, so connections stay warm;
+* a request queue: `Request` objects yielded by a spider callback are
+  scheduled (de-duplicated by URL unless ``dont_filter``) alongside the start
+  URLs.
+
+It still does not implement Scrapy features like middlewares, pipelines or
+robots.txt handling.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Iterable, List
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit
 
-import requests
+import httpx
 
-from . import Response
+from . import Request, Response
 
 logger = logging.getLogger("scrapy_shim")
 
 
+class _Host:
+    def __init__(self, concurrency: int):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.last_start = 0.0
+
+
 class CrawlerProcess:
     def __init__(self, settings: dict | None = None):
         self.settings = settings or {}
@@ -27,26 +47,114 @@ class CrawlerProcess:
         spider = spider_cls(start_urls=start_urls, *args, **kwargs)
         self._spiders.append(spider)
 
-    def start(self):
-        results = []
+    def start(self, loop: asyncio.AbstractEventLoop | None = None, client: httpx.AsyncClient | None = None):
+        """Crawl all scheduled spiders to completion and return the collected items.
+
+        With `loop` and `client` the crawl runs on that loop and leaves the
+        client open for the next run; otherwise both are created and torn
+        down here.
+        """
+        if loop is None:
+            return asyncio.run(self._crawl(client))
+        return loop.run_until_complete(self._crawl(client))
+
+    def open_client(self) -> httpx.AsyncClient:
+        """An `httpx.AsyncClient` configured from the settings."""
+        concurrency = int(self.settings.get("CONCURRENT_REQUESTS", 16))
+        headers = dict(self.settings.get("DEFAULT_REQUEST_HEADERS", {}))
+        if "USER_AGENT" in self.settings:
+            headers.setdefault("User-Agent", self.settings["USER_AGENT"])
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        timeout = float(self.settings.get("DOWNLOAD_TIMEOUT", 10))
+        return httpx.AsyncClient(headers=headers, limits=limits, timeout=timeout, follow_redirects=True)
+
+    async def _crawl(self, client: httpx.AsyncClient | None = None) -> List[Any]:
+        concurrency = int(self.settings.get("CONCURRENT_REQUESTS", 16))
+        self._per_host = int(self.settings.get("CONCURRENT_REQUESTS_PER_DOMAIN", 8))
+        self._delay = float(self.settings.get("DOWNLOAD_DELAY", 0))
+        self._retries = int(self.settings.get("RETRY_TIMES", 0))
+        self._hosts: Dict[str, _Host] = {}
+        self._seen: set = set()
+        self._results: List[Any] = []
+        self._queue: asyncio.Queue[Tuple[Any, Request]] = asyncio.Queue()
+
         for spider in self._spiders:
-            urls = getattr(spider, "start_urls", []) or []
-            for url in urls:
+            for url in getattr(spider, "start_urls", []) or []:
+                self._schedule(spider, Request(url=url))
+
+        if client is not None:
+            await self._run(client, concurrency)
+        else:
+            async with self.open_client() as client:
+                await self._run(client, concurrency)
+        return self._results
+
+    async def _run(self, client: httpx.AsyncClient, concurrency: int) -> None:
+        workers = [asyncio.create_task(self._worker(client)) for _ in range(concurrency)]
+        await self._queue.join()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def _schedule(self, spider, request: Request) -> None:
+        if not request.dont_filter:
+            if request.url in self._seen:
+                return
+            self._seen.add(request.url)
+        self._queue.put_nowait((spider, request))
+
+    def _host(self, url: str) -> _Host:
+        netloc = urlsplit(url).netloc
+        host = self._hosts.get(netloc)
+        if host is None:
+            host = self._hosts[netloc] = _Host(self._per_host)
+        return host
+
+    async def _worker(self, client: httpx.AsyncClient) -> None:
+        while True:
+            spider, request = await self._queue.get()
+            try:
+                await self._process(client, spider, request)
+            except Exception as exc:
+                logger.exception("Error fetching %s: %s", request.url, exc)
+            finally:
+                self._queue.task_done()
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> httpx.Response:
+        host = self._host(url)
+        async with host.slots:
+            if self._delay:
+                # politeness: space out request starts to the same host
+                async with host.lock:
+                    wait = host.last_start + self._delay - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    host.last_start = time.monotonic()
+            for attempt in range(self._retries + 1):
                 try:
-                    resp = requests.get(url, timeout=10)
-                    shim_resp = Response(url=resp.url, status=resp.status_code, text=resp.text)
-                    parsed = spider.parse(shim_resp)
-                    # If parse yields items (generator or list), collect them
-                    if parsed is None:
-                        continue
-                    if hasattr(parsed, "__iter__") and not isinstance(parsed, dict):
-                        for item in parsed:
-                            results.append(item)
-                    else:
-                        results.append(parsed)
-                except Exception as exc:
-                    logger.exception("Error fetching %s: %s", url, exc)
-        return results
+                    return await client.get(url)
+                except httpx.TransportError:
+                    if attempt >= self._retries:
+                        raise
+
+    async def _process(self, client: httpx.AsyncClient, spider, request: Request) -> None:
+        resp = await self._fetch(client, request.url)
+        shim_resp = Response(url=str(resp.url), status=resp.status_code, text=resp.text, meta=request.meta)
+        callback = request.callback or spider.parse
+        parsed = callback(shim_resp)
+        # If parse yields items (generator or list), collect them
+        if parsed is None:
+            return
+        if hasattr(parsed, "__iter__") and not isinstance(parsed, dict):
+            for item in parsed:
+                if isinstance(item, Request):
+                    self._schedule(spider, item)
+                else:
+                    self._results.append(item)
+        elif isinstance(parsed, Request):
+            self._schedule(spider, parsed)
+        else:
+            self._results.append(parsed)
 
 
 __all__ = ["CrawlerProcess"]
@@ -1,17 +1,34 @@
 """Project settings shim used by the minimal scrapy implementation.
 
 Returns a plain dict of settings. Real Scrapy offers a complex Settings object
-— this shim returns a lightweight mapping that is sufficient for the small
-crawler used in this project.
+— this shim returns a lightweight mapping built from a few defaults plus the
+upper-case names of the project settings module (``SCRAPY_SETTINGS_MODULE``,
+``src.scraper.settings`` by default, as in ``scrapy.cfg``).
 """
+import importlib
+import logging
+import os
 from typing import Dict
 
+logger = logging.getLogger("scrapy_shim")
+
 
 def get_project_settings() -> Dict:
-    # Minimal settings placeholder. Add keys here if your spiders expect them.
-    return {
+    settings = {
         "USER_AGENT": "scrapy-shim/0.1",
+        "CONCURRENT_REQUESTS": 16,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+        "DOWNLOAD_DELAY": 0,
+        "DOWNLOAD_TIMEOUT": 10,
     }
+    module_name = os.environ.get("SCRAPY_SETTINGS_MODULE", "src.scraper.settings")
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError:
+        logger.warning("Settings module %s not importable; using shim defaults", module_name)
+        return settings
+    settings.update({k: getattr(module, k) for k in dir(module) if k.isupper()})
+    return settings
 
 
 __all__ = ["get_project_settings"]
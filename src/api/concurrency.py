@@ -0,0 +1,30 @@
+"""Executors used by the async API handlers.
+
+FAISS search is CPU-bound and releases the GIL inside numpy / FAISS, so it
+runs on a dedicated, bounded thread pool instead of the event loop or
+Starlette's shared threadpool. Sizing it separately keeps a burst of searches
+from starving other blocking work.
+
+Query embedding is mostly a network round trip to the embedding API, so it
+gets its own, wider pool: a slow API call then never holds a search thread.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+FAISS_SEARCH_WORKERS = int(os.getenv("FAISS_SEARCH_WORKERS", str(os.cpu_count() or 4)))
+
+EMBED_QUERY_WORKERS = int(os.getenv("EMBED_QUERY_WORKERS", "32"))
+
+search_executor = ThreadPoolExecutor(max_workers=FAISS_SEARCH_WORKERS, thread_name_prefix="faiss-search")
+embed_executor = ThreadPoolExecutor(max_workers=EMBED_QUERY_WORKERS, thread_name_prefix="query-embed")
+
+
+async def run_in_search_pool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, partial(fn, *args, **kwargs))
+
+
+__all__ = ["search_executor", "embed_executor", "run_in_search_pool"]
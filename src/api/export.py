@@ -0,0 +1,74 @@
+# src/api/export.py
+"""Bulk NDJSON export of the scraped corpus.
+
+Each endpoint streams one JSON object per line with chunked transfer
+encoding. Rows are read from a Mongo cursor (or `FaissClient.iter_vectors`)
+in large batches, encoded with orjson and flushed every `EXPORT_CHUNK_ROWS`
+rows, so memory stays bounded by one batch however big the collection is.
+"""
+import os
+from typing import AsyncIterator, Iterator, Optional
+
+import orjson
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from src.infra.mongo.client import AsyncMongoClientSingleton
+from src.infra.mongo.indexes import BOOK_LIST_PROJECTION, QUOTE_LIST_PROJECTION
+from src.rag.pipeline import get_faiss_client
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+NDJSON = "application/x-ndjson"
+
+router = APIRouter()
+mongo = AsyncMongoClientSingleton().db
+
+
+def _dumps(row) -> bytes:
+    return orjson.dumps(row, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY)
+
+
+async def _mongo_rows(collection, query, projection) -> AsyncIterator[bytes]:
+    cursor = collection.find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+    chunk = []
+    async for doc in cursor:
+        chunk.append(_dumps(doc))
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _vector_rows(include_vectors: bool) -> Iterator[bytes]:
+    # sync generator: Starlette iterates it on its threadpool
+    for ids, vectors, metadatas in get_faiss_client().iter_vectors(EXPORT_BATCH_SIZE, with_vectors=include_vectors):
+        lines = []
+        for row, (_id, md) in enumerate(zip(ids.tolist(), metadatas)):
+            out = {"id": _id, "metadata": md}
+            if include_vectors:
+                out["vector"] = vectors[row] if vectors is not None else None
+            lines.append(_dumps(out))
+        yield b"".join(lines)
+
+
+@router.get("/export/quotes")
+async def export_quotes(author: Optional[str] = None, tag: Optional[str] = None):
+    q = {}
+    if author:
+        q["author"] = author
+    if tag:
+        q["tags"] = tag
+    return StreamingResponse(_mongo_rows(mongo.quotes, q, QUOTE_LIST_PROJECTION), media_type=NDJSON)
+
+
+@router.get("/export/books")
+async def export_books():
+    return StreamingResponse(_mongo_rows(mongo.book_images, {}, BOOK_LIST_PROJECTION), media_type=NDJSON)
+
+
+@router.get("/export/vectors")
+async def export_vectors(include_vectors: bool = Query(True)):
+    return StreamingResponse(_vector_rows(include_vectors), media_type=NDJSON)
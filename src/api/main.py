@@ -1,37 +1,46 @@
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
+import orjson
+from contextlib import asynccontextmanager
 from .search import router as search_router
-from src.infra.mongo.client import MongoClientSingleton
-from fastapi import FastAPI, Query
-from src.rag.pipeline import get_faiss_client
+from .export import router as export_router
+from src.api.concurrency import embed_executor, search_executor
+from src.api.pagination import SORT, apply_cursor, next_cursor
+from src.infra.mongo.client import AsyncMongoClientSingleton
+from src.infra.mongo.indexes import (
+    BOOK_LIST_PROJECTION,
+    MONGO_ENSURE_INDEXES,
+    QUOTE_LIST_PROJECTION,
+    ensure_indexes_async,
+)
 from typing import Optional
-from src.rag.search_and_summarize import search_and_summarize
 from src.rag.pipeline import get_faiss_client
-from src.rag.embeddings import embed_text
+from src.rag.search_and_summarize import search_and_summarize_async, search_and_stream
 from prometheus_client import Counter, start_http_server
 REQUESTS = Counter("api_requests_total", "Total API requests", ["path", "method", "status"])
 start_http_server(8002)
 
-app = FastAPI()
-mongo = MongoClientSingleton().db
-faiss_client = get_faiss_client()
-app.include_router(search_router, prefix="/api")
+mongo = AsyncMongoClientSingleton().db
 
 
 class HealthResponse(BaseModel):
     status: str
 
 
-app = FastAPI(title="Distributed RAG Scraper API", default_response_class=ORJSONResponse)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the API only searches; the spiders/workers own the store and its lock
+    get_faiss_client(read_only=True)
+    if MONGO_ENSURE_INDEXES:
+        await ensure_indexes_async(mongo)
+    yield
 
-@app.get("/search/quotes")
-def search_quotes(query: str, top_k: int = Query(5, le=50)):
-    """Semantic search over quotes using FAISS embeddings."""
-    results = faiss_client.search(query, top_k=top_k)
-    # results = list of dicts with metadata + similarity score
-    return results
+
+app = FastAPI(title="Distributed RAG Scraper API", default_response_class=ORJSONResponse, lifespan=lifespan)
+app.include_router(search_router, prefix="/api")
+app.include_router(export_router)
 
 @app.get("/health", response_model=HealthResponse)
 def health() -> HealthResponse:
@@ -39,41 +48,81 @@ def health() -> HealthResponse:
 
 
 @app.get("/")
-def root():
+async def root():
     return {"service": "rag-scraper", "env": os.getenv("ENV", "dev")}
 
 
 # Raw data endpoints with pagination
 @app.get("/quotes")
-def get_quotes(limit: int = 20, skip: int = 0, author: Optional[str] = None, tag: Optional[str] = None):
+async def get_quotes(
+    limit: int = Query(20, ge=1, le=1000),
+    skip: int = 0,
+    author: Optional[str] = None,
+    tag: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    """Newest quotes first. Pass the returned `next_cursor` back as `cursor`
+    for the next page; `skip` is kept for old clients but gets slower with depth."""
     q = {}
     if author:
         q["author"] = author
     if tag:
         q["tags"] = tag
-    cursor = mongo.quotes.find(q).sort("scraped_at", -1).skip(skip).limit(limit)
+    q = apply_cursor(q, cursor)
+    results = mongo.quotes.find(q, QUOTE_LIST_PROJECTION).sort(SORT).limit(limit)
+    if skip and not cursor:
+        results = results.skip(skip)
     docs = []
-    for d in cursor:
+    async for d in results:
         d["_id"] = str(d["_id"])
         docs.append(d)
-    return {"count": len(docs), "items": docs}
+    return {"count": len(docs), "items": docs, "next_cursor": next_cursor(docs, limit)}
 
 @app.get("/books")
-def get_books(limit: int = 20, skip: int = 0, title: Optional[str] = None):
+async def get_books(
+    limit: int = Query(20, ge=1, le=1000),
+    skip: int = 0,
+    title: Optional[str] = None,
+    cursor: Optional[str] = None,
+):
+    """Newest books first, paginated like `/quotes`."""
     q = {}
     if title:
-        q["title"] = {"$regex": title, "$options": "i"}
-    cursor = mongo.book_images.find(q).sort("scraped_at", -1).skip(skip).limit(limit)
+        # served by the title text index instead of an unanchored regex scan
+        q["$text"] = {"$search": title}
+    q = apply_cursor(q, cursor)
+    results = mongo.book_images.find(q, BOOK_LIST_PROJECTION).sort(SORT).limit(limit)
+    if skip and not cursor:
+        results = results.skip(skip)
     docs = []
-    for d in cursor:
+    async for d in results:
         d["_id"] = str(d["_id"])
         docs.append(d)
-    return {"count": len(docs), "items": docs}
+    return {"count": len(docs), "items": docs, "next_cursor": next_cursor(docs, limit)}
 
 # Semantic search (quotes)
 @app.get("/search/quotes")
-def api_search_quotes(query: str, top_k: int = Query(5, ge=1, le=50), summary_k: int = Query(3, ge=1, le=10)):
+async def api_search_quotes(query: str, top_k: int = Query(5, ge=1, le=50), summary_k: int = Query(3, ge=1, le=10)):
     try:
-        return search_and_summarize(query, top_k=top_k, summary_k=summary_k)
+        return await search_and_summarize_async(query, top_k=top_k, summary_k=summary_k, executor=search_executor, embed_executor=embed_executor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/search/quotes/stream")
+async def api_search_quotes_stream(query: str, top_k: int = Query(5, ge=1, le=50), summary_k: int = Query(3, ge=1, le=10)):
+    """Server-sent events: a `results` event right after the vector search,
+    then `summary` events as the LLM produces text, then `done`."""
+    async def events():
+        try:
+            async for event, data in search_and_stream(
+                query, top_k=top_k, summary_k=summary_k, executor=search_executor, embed_executor=embed_executor
+            ):
+                yield f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {orjson.dumps({'detail': str(e)}).decode()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,55 @@
+"""Keyset pagination for the listing endpoints.
+
+Listings are ordered newest first by ``(scraped_at, _id)``. The cursor handed
+back to clients is an opaque url-safe token encoding that pair for the last
+item of a page; the next page is a range query strictly below it, which an
+index on ``(..., scraped_at, _id)`` answers without skipping, so every page
+costs the same no matter how deep it is.
+"""
+import base64
+from typing import Any, Dict, List, Optional
+
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+
+SORT = [("scraped_at", -1), ("_id", -1)]
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = orjson.dumps([doc.get("scraped_at"), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Return the Mongo filter selecting everything after `cursor`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        scraped_at, oid = orjson.loads(raw)
+        oid = ObjectId(oid)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        "$or": [
+            {"scraped_at": {"$lt": scraped_at}},
+            {"scraped_at": scraped_at, "_id": {"$lt": oid}},
+        ]
+    }
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    if not cursor:
+        return query
+    after = decode_cursor(cursor)
+    return {"$and": [query, after]} if query else after
+
+
+def next_cursor(docs: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """Cursor for the page after `docs`, or None if this was the last page."""
+    if not docs or len(docs) < limit:
+        return None
+    return encode_cursor(docs[-1])
+
+
+__all__ = ["SORT", "apply_cursor", "decode_cursor", "encode_cursor", "next_cursor"]
@@ -1,20 +1,20 @@
 # src/api/search.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from src.infra.vector.faiss_client import FaissClient
-from src.rag.embeddings import get_embedding
+from src.api.concurrency import embed_executor, search_executor
+from src.rag.search_cache import cached_search_async
 
 router = APIRouter()
-faiss = FaissClient()
 
 class SearchReq(BaseModel):
     q: str
     top_k: int = 5
 
 @router.post("/search")
-def search_quotes(req: SearchReq):
-    emb = get_embedding(req.q)
-    results = faiss.search(emb, top_k=req.top_k)
+async def search_quotes(req: SearchReq):
+    results = await cached_search_async(
+        req.q, top_k=req.top_k, embed_executor=embed_executor, search_executor=search_executor
+    )
     if results is None:
         raise HTTPException(500, "search failed")
     # results should include id, score, meta
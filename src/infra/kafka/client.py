@@ -2,12 +2,30 @@ import os
 from typing import Any, Dict
 from confluent_kafka import Producer, Consumer, KafkaException
 
+# Producer batching: messages wait up to linger.ms to fill a batch, and
+# whole batches are compressed, so throughput is bounded by the broker
+# rather than by one round-trip per message.
+KAFKA_LINGER_MS = int(os.getenv("KAFKA_LINGER_MS", "20"))
+KAFKA_BATCH_BYTES = int(os.getenv("KAFKA_BATCH_BYTES", str(1024 * 1024)))
+KAFKA_COMPRESSION = os.getenv("KAFKA_COMPRESSION", "lz4")  # none | gzip | snappy | lz4 | zstd
+KAFKA_QUEUE_MAX_MESSAGES = int(os.getenv("KAFKA_QUEUE_MAX_MESSAGES", "1000000"))
 
-def create_producer() -> Producer:
+
+def create_producer(**overrides: Any) -> Producer:
+    """Batched, compressed, idempotent producer; `overrides` are raw librdkafka settings
+    (e.g. ``on_delivery`` for a delivery-report callback)."""
     cfg: Dict[str, Any] = {
         "bootstrap.servers": os.getenv("KAFKA_BOOTSTRAP", "localhost:9092"),
         "client.id": "rag-scraper-producer",
+        "linger.ms": KAFKA_LINGER_MS,
+        "batch.size": KAFKA_BATCH_BYTES,
+        "batch.num.messages": 10000,
+        "compression.type": KAFKA_COMPRESSION,
+        "queue.buffering.max.messages": KAFKA_QUEUE_MAX_MESSAGES,
+        "queue.buffering.max.kbytes": 1024 * 1024,
+        "enable.idempotence": True,
     }
+    cfg.update(overrides)
     return Producer(cfg)
 
 
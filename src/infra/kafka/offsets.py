@@ -0,0 +1,84 @@
+"""Per-partition offset tracking for consumers with several messages in flight.
+
+Messages finish out of order once batches run concurrently, so a blanket
+`commit()` of the consumer position could skip work that is still running.
+`OffsetTracker` records every offset handed out (`track`) and every offset
+finished (`done`), and per partition keeps the low watermark: the smallest
+offset still outstanding. Only the contiguous completed prefix below it is
+ever reported by `committable`, so a crash re-delivers exactly the messages
+that had not finished (at-least-once).
+
+The tracker is client-agnostic: it deals in (topic, partition, offset)
+tuples, which callers turn into confluent-kafka `TopicPartition`s or
+kafka-python `OffsetAndMetadata`s.
+"""
+import heapq
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+TP = Tuple[str, int]
+
+
+class _Partition:
+    __slots__ = ("outstanding", "heap", "finished", "next_offset", "committed")
+
+    def __init__(self):
+        self.outstanding: Set[int] = set()
+        self.heap: List[int] = []
+        self.finished: Set[int] = set()
+        self.next_offset = -1  # one past the highest offset tracked
+        self.committed = -1
+
+    def watermark(self) -> int:
+        while self.heap and self.heap[0] in self.finished:
+            offset = heapq.heappop(self.heap)
+            self.finished.discard(offset)
+            self.outstanding.discard(offset)
+        return self.heap[0] if self.heap else self.next_offset
+
+
+class OffsetTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._partitions: Dict[TP, _Partition] = {}
+
+    def track(self, topic: str, partition: int, offset: int) -> None:
+        with self._lock:
+            p = self._partitions.setdefault((topic, partition), _Partition())
+            if offset in p.outstanding:
+                return
+            p.outstanding.add(offset)
+            heapq.heappush(p.heap, offset)
+            p.next_offset = max(p.next_offset, offset + 1)
+
+    def done(self, topic: str, partition: int, offset: int) -> None:
+        """Mark an offset finished; offsets of revoked partitions are ignored."""
+        with self._lock:
+            p = self._partitions.get((topic, partition))
+            if p is not None and offset in p.outstanding:
+                p.finished.add(offset)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(p.outstanding) - len(p.finished) for p in self._partitions.values())
+
+    def committable(self) -> List[Tuple[str, int, int]]:
+        """(topic, partition, offset-to-commit) for partitions whose watermark
+        advanced since the last call; the offset is the next one to consume."""
+        out = []
+        with self._lock:
+            for (topic, partition), p in self._partitions.items():
+                wm = p.watermark()
+                if wm > p.committed:
+                    p.committed = wm
+                    out.append((topic, partition, wm))
+        return out
+
+    def forget(self, partitions: Iterable[TP]) -> None:
+        """Drop state for revoked partitions."""
+        with self._lock:
+            for tp in partitions:
+                self._partitions.pop(tuple(tp), None)
+
+
+__all__ = ["OffsetTracker"]
@@ -0,0 +1,127 @@
+"""Buffered upserts for the processing layer.
+
+`BulkUpsertWriter` collects documents and writes them as a single unordered
+`bulk_write` of `UpdateOne(key, {"$set": doc}, upsert=True)` operations once
+`batch_size` documents are buffered or `flush_interval` seconds have passed
+since the first one, so ingest costs one round-trip per batch instead of one
+or two per item. Documents sharing a key within a batch are collapsed (last
+write wins) so unordered upserts never race on the same key.
+
+`flush` returns, per document, the `_id` Mongo reported in
+`BulkWriteResult.upserted_ids`; documents that matched an existing row get
+`None` rather than costing an extra query. `write` bypasses the buffer and
+sends its own batch, so the ids it returns are always its own even when
+several threads write at once.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+MONGO_BULK_SIZE = int(os.getenv("MONGO_BULK_SIZE", "500"))
+MONGO_BULK_INTERVAL = float(os.getenv("MONGO_BULK_INTERVAL", "1.0"))
+
+
+class BulkUpsertWriter:
+    def __init__(
+        self,
+        collection,
+        key_fields: Sequence[str],
+        batch_size: int = MONGO_BULK_SIZE,
+        flush_interval: float = MONGO_BULK_INTERVAL,
+    ):
+        self.collection = collection
+        self.key_fields = tuple(key_fields)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: Dict[Tuple, Dict[str, Any]] = {}
+        self._first_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if flush_interval and flush_interval > 0:
+            self._thread = threading.Thread(target=self._flush_loop, name="mongo-bulk-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        """Buffer `doc`; flushes inline once the batch is full."""
+        key = tuple(doc.get(f) for f in self.key_fields)
+        with self._lock:
+            self._buffer[key] = doc
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def write(self, docs: Sequence[Dict[str, Any]]) -> List[Optional[Any]]:
+        """Upsert `docs` now and return their upserted ids in order."""
+        keys = [tuple(doc.get(f) for f in self.key_fields) for doc in docs]
+        batch = dict(zip(keys, docs))
+        with self._lock:
+            # these docs supersede any buffered versions of the same keys
+            for key in batch:
+                self._buffer.pop(key, None)
+        ids = self._bulk_upsert(batch)
+        return [ids.get(key) for key in keys]
+
+    def flush(self) -> Dict[Tuple, Optional[Any]]:
+        """Write the buffer; returns {key: upserted _id or None}."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer, self._first_at = self._buffer, {}, None
+            if not batch:
+                return {}
+            try:
+                return self._bulk_upsert(batch)
+            except Exception:
+                # nothing was acknowledged; keep the batch for the next flush
+                with self._lock:
+                    for key, doc in batch.items():
+                        self._buffer.setdefault(key, doc)
+                    if self._first_at is None:
+                        self._first_at = time.monotonic()
+                raise
+
+    def _bulk_upsert(self, batch: Dict[Tuple, Dict[str, Any]]) -> Dict[Tuple, Optional[Any]]:
+        keys = list(batch)
+        ops = [
+            UpdateOne(dict(zip(self.key_fields, key)), {"$set": doc}, upsert=True)
+            for key, doc in batch.items()
+        ]
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            upserted = result.upserted_ids or {}
+        except BulkWriteError as exc:
+            # unordered: everything but the reported errors was applied
+            logger.error("Bulk upsert into %s had %d errors", self.collection.name, len(exc.details.get("writeErrors", [])))
+            upserted = {u["index"]: u["_id"] for u in exc.details.get("upserted", [])}
+        return {key: upserted.get(i) for i, key in enumerate(keys)}
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval / 2):
+            first_at = self._first_at
+            if first_at is not None and time.monotonic() - first_at >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Background bulk flush into %s failed", self.collection.name)
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final bulk flush into %s failed", self.collection.name)
+
+
+__all__ = ["BulkUpsertWriter"]
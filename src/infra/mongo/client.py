@@ -97,8 +97,11 @@
 #     def get_clean(self, doc_id):
 #         return self.clean.find_one({"_id": doc_id})
 # src/infra/mongo/client.py
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 import os
+import threading
+
+from src.infra.mongo.indexes import MONGO_ENSURE_INDEXES, ensure_indexes
 
 class MongoClientSingleton:
     _instance = None
@@ -108,4 +111,23 @@ class MongoClientSingleton:
             client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
             cls._instance = client
             cls._instance.db = client.get_database(os.getenv("MONGO_DB", "scraper_db"))
+            if MONGO_ENSURE_INDEXES:
+                # off the import path so a slow or absent server does not block startup
+                threading.Thread(target=ensure_indexes, args=(cls._instance.db,), name="mongo-indexes", daemon=True).start()
+        return cls._instance
+
+
+class AsyncMongoClientSingleton:
+    """Async counterpart of `MongoClientSingleton` for the FastAPI handlers.
+
+    Uses pymongo's native asyncio client, so cursors are awaited on the event
+    loop instead of blocking a worker thread.
+    """
+    _instance = None
+    def __new__(cls):
+        if cls._instance is None:
+            mongo_url = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+            client = AsyncMongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+            cls._instance = client
+            cls._instance.db = client.get_database(os.getenv("MONGO_DB", "scraper_db"))
         return cls._instance
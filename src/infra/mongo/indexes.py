@@ -0,0 +1,66 @@
+"""Index definitions for the scraper collections.
+
+`ensure_indexes` (sync, for `MongoClientSingleton`) and `ensure_indexes_async`
+(for the API's startup hook) create them idempotently; Mongo skips indexes
+that already exist with the same spec. Failures are logged rather than raised
+so an unreachable database or legacy duplicates never block startup.
+
+* quotes: ``(author, scraped_at, _id)`` and multikey ``(tags, scraped_at,
+  _id)`` serve the filtered, newest-first listing and its keyset cursor
+  without an in-memory sort; ``(scraped_at, _id)`` serves the unfiltered
+  listing; ``(url, text)`` is the unique upsert key used by the processor.
+* book_images: ``(scraped_at, _id)`` for listing, unique ``image_url`` for
+  upserts, and a text index on ``title`` for title search.
+"""
+import logging
+import os
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+logger = logging.getLogger(__name__)
+
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "1") == "1"
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "quotes": [
+        IndexModel([("author", ASCENDING), ("scraped_at", DESCENDING), ("_id", DESCENDING)], name="author_scraped_at_id"),
+        IndexModel([("tags", ASCENDING), ("scraped_at", DESCENDING), ("_id", DESCENDING)], name="tags_scraped_at_id"),
+        IndexModel([("scraped_at", DESCENDING), ("_id", DESCENDING)], name="scraped_at_id"),
+        IndexModel([("url", ASCENDING), ("text", ASCENDING)], name="url_text", unique=True),
+    ],
+    "book_images": [
+        IndexModel([("scraped_at", DESCENDING), ("_id", DESCENDING)], name="scraped_at_id"),
+        IndexModel([("image_url", ASCENDING)], name="image_url", unique=True),
+        IndexModel([("title", TEXT)], name="title_text", default_language="english"),
+    ],
+}
+
+# fields returned by the listing endpoints
+QUOTE_LIST_PROJECTION = {"text": 1, "author": 1, "tags": 1, "url": 1, "scraped_at": 1}
+BOOK_LIST_PROJECTION = {"title": 1, "price": 1, "image_url": 1, "local_path": 1, "page_url": 1, "scraped_at": 1}
+
+
+def ensure_indexes(db) -> None:
+    for collection, models in INDEXES.items():
+        try:
+            db[collection].create_indexes(models)
+        except Exception as e:
+            logger.warning("Could not create indexes on %s: %s", collection, e)
+
+
+async def ensure_indexes_async(db) -> None:
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except Exception as e:
+            logger.warning("Could not create indexes on %s: %s", collection, e)
+
+
+__all__ = [
+    "INDEXES",
+    "QUOTE_LIST_PROJECTION",
+    "BOOK_LIST_PROJECTION",
+    "ensure_indexes",
+    "ensure_indexes_async",
+]
@@ -1,22 +1,36 @@
 """Lightweight FAISS client wrapper with an in-memory metadata store.
 
 This wrapper tries to use the `faiss` Python bindings. If FAISS is not
-available, it falls back to a simple numpy brute-force index for local demos.
+available, it falls back to a numpy brute-force index (see `numpy_index.py`).
 
 Note: FAISS does not store metadata; this module keeps a parallel mapping of
-vector id -> metadata in-memory and persists it to disk (JSON) if configured.
+vector id -> metadata in-memory and persists it to disk as a JSON snapshot
+plus an append-only log (see `metadata_log.py`). When `index_path` is set
+the index itself is snapshotted atomically on a background thread and
+restored, together with the metadata, on the next start. A store (metadata
+and index paths) has a single writer: the client holds an exclusive lock
+file on each path and a second client on the same paths fails at startup.
+Readers that only search (the API) open the store with `read_only=True`:
+no lock, no snapshots, no metadata writes, and upserts are refused.
+The index type is
+chosen with a FAISS index_factory spec (`FAISS_INDEX_SPEC`, e.g. "HNSW32" or
+"IVF4096,PQ64").
 For production, prefer a vector DB that natively stores metadata (Qdrant,
 Weaviate, Pinecone) or persist metadata in Mongo.
 """
 from __future__ import annotations
 
 import os
-import json
+import atexit
+import logging
 import threading
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 import numpy as np
 
+from src.infra.vector.metadata_log import MetadataLog
+from src.infra.vector.numpy_index import NumpyIndex
+
 try:
     import faiss
     _FAISS_AVAILABLE = True
@@ -24,120 +38,594 @@ except Exception:
     faiss = None
     _FAISS_AVAILABLE = False
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
 
 class FaissClient:
-    def __init__(self, dim: int = 1536, index_path: Optional[str] = None, metadata_path: Optional[str] = None):
+    def __init__(
+        self,
+        dim: int = 1536,
+        index_path: Optional[str] = None,
+        metadata_path: Optional[str] = None,
+        snapshot_interval: Optional[float] = None,
+        snapshot_every: Optional[int] = None,
+        index_spec: Optional[str] = None,
+        read_only: bool = False,
+    ):
         self.dim = dim
+        self.read_only = read_only
         self.index_path = index_path or os.environ.get("FAISS_INDEX_PATH")
         self.metadata_path = metadata_path or os.environ.get("FAISS_METADATA_PATH", "faiss_metadata.json")
+        # background snapshots: every `snapshot_interval` seconds, or sooner once
+        # `snapshot_every` vectors have changed since the last one
+        if snapshot_interval is None:
+            snapshot_interval = float(os.environ.get("FAISS_SNAPSHOT_INTERVAL", "60"))
+        if snapshot_every is None:
+            snapshot_every = int(os.environ.get("FAISS_SNAPSHOT_EVERY", "1000"))
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+        # FAISS index_factory string, e.g. "Flat", "HNSW32", "IVF4096,PQ64".
+        # Specs that need training start as an exact flat index and migrate
+        # once the corpus reaches `migrate_threshold` vectors.
+        self.index_spec = index_spec or os.environ.get("FAISS_INDEX_SPEC", "Flat")
+        self.migrate_threshold = int(os.environ.get("FAISS_MIGRATE_THRESHOLD", "200000"))
+        self.train_sample = int(os.environ.get("FAISS_TRAIN_SAMPLE", "200000"))
+        self.nprobe = int(os.environ.get("FAISS_NPROBE", "16"))
+        self.ef_search = int(os.environ.get("FAISS_EF_SEARCH", "64"))
+        # indexes that cannot remove vectors (HNSW) are rebuilt from their live
+        # rows once this fraction of their rows is superseded
+        self.compact_ratio = float(os.environ.get("FAISS_COMPACT_RATIO", "0.25"))
+        self._migrate_pending = False
         self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
         self._metastore: Dict[int, Dict[str, Any]] = {}
         self._next_id = 1
+        self._dirty = 0
+        self._tombstones = 0
+        # bumped on every write so callers can key caches on index contents
+        self.generation = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._lock_files = []
+        if not read_only:
+            self._acquire_store_locks()
 
         if _FAISS_AVAILABLE:
-            # Use an IndexFlatIP (inner product) with ID map so we can assign ids
-            self._index = faiss.IndexFlatIP(self.dim)
-            self._index = faiss.IndexIDMap(self._index)
+            self._index = self._new_index()
             if self.index_path and os.path.exists(self.index_path):
                 try:
                     self._index = faiss.read_index(self.index_path)
                 except Exception:
-                    pass
+                    logger.exception("Could not read FAISS index %s", self.index_path)
+            self._migrate_pending = self.index_spec != "Flat" and self._is_flat()
+            if hasattr(self._index, "id_map") and self._index.ntotal:
+                self._tombstones = int((self._id_map_view() < 0).sum())
         else:
-            # Fallback: store embeddings in numpy arrays and brute-force search
-            self._embeddings = np.zeros((0, self.dim), dtype="float32")
-            self._ids: List[int] = []
+            # Fallback: brute-force numpy index, optionally memory-mapped to disk
+            self._index = NumpyIndex(self.dim, mmap_path=os.environ.get("FAISS_FALLBACK_MMAP_PATH"))
+            if self.index_path:
+                self._load_numpy_snapshot()
+
+        # load metadata: last snapshot plus whatever was appended after it
+        self._metalog = MetadataLog(
+            self.metadata_path,
+            compact_every=int(os.environ.get("FAISS_METADATA_COMPACT_EVERY", "10000")),
+        )
+        # a reader must not truncate a log tail the writer is still appending
+        self._metastore = self._metalog.load(repair=not read_only)
+        if self.index_path:
+            self._reconcile()
+        index_ids = self._index_ids()
+        self._next_id = max(
+            max(self._metastore.keys(), default=0),
+            int(index_ids.max()) if index_ids.size else 0,
+        ) + 1
+
+        if self.index_path and self.snapshot_interval > 0 and not read_only:
+            self._snapshot_thread = threading.Thread(
+                target=self._snapshot_loop, name="faiss-snapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+            atexit.register(self.close)
 
-        # load metadata if exists
-        if os.path.exists(self.metadata_path):
+    def _acquire_store_locks(self):
+        """Lock the metadata and index paths so a second writer fails loudly.
+
+        Two clients on one store would both assign ids from the same counter
+        and overwrite each other's snapshots.
+        """
+        if fcntl is None:
+            return
+        for path in filter(None, (self.metadata_path, self.index_path)):
+            fh = open(f"{path}.lock", "a")
             try:
-                with open(self.metadata_path, "r", encoding="utf-8") as fh:
-                    data = json.load(fh)
-                    # keys are strings
-                    for k, v in data.items():
-                        kid = int(k)
-                        self._metastore[kid] = v
-                    if self._metastore:
-                        self._next_id = max(self._metastore.keys()) + 1
-            except Exception:
-                pass
-
-    def _persist_metadata(self):
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                fh.close()
+                self._release_store_locks()
+                raise RuntimeError(
+                    f"FAISS store {path} is already open by another FaissClient; share one client "
+                    "(get_faiss_client()) or give this one its own FAISS_INDEX_PATH/FAISS_METADATA_PATH"
+                )
+            self._lock_files.append(fh)
+
+    def _release_store_locks(self):
+        for fh in self._lock_files:
+            fh.close()  # closing the descriptor drops the flock
+        self._lock_files = []
+
+    # --- index construction and migration --------------------------------
+
+    def _new_index(self):
+        target = faiss.index_factory(self.dim, self.index_spec, faiss.METRIC_INNER_PRODUCT)
+        if target.is_trained:
+            return self._with_ids(target)
+        # IVF/PQ need training data; serve exact search until there is enough
+        return faiss.IndexIDMap(faiss.IndexFlatIP(self.dim))
+
+    @staticmethod
+    def _with_ids(target):
+        """Make `target` accept caller-assigned ids.
+
+        IVF indexes store ids in their inverted lists and, with a hashtable
+        direct map, can remove and reconstruct by id, so they are used as is:
+        an IndexIDMap around them goes stale on removal, because it compacts
+        its id map while IVF keeps its internal labels. Other indexes get an
+        IndexIDMap.
+        """
         try:
-            with open(self.metadata_path, "w", encoding="utf-8") as fh:
-                json.dump({str(k): v for k, v in self._metastore.items()}, fh)
+            ivf = faiss.extract_index_ivf(target)
         except Exception:
-            pass
+            return faiss.IndexIDMap(target)
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return target
 
-    def upsert(self, embedding: List[float], metadata: Dict[str, Any], id: Optional[int] = None) -> int:
-        """Upsert a single vector and metadata. Returns the assigned id."""
-        with self._lock:
-            if id is None:
-                id = self._next_id
-                self._next_id += 1
-            query_embedding = embed_text(query, dim=FAISS_DIM)
-            vec = np.asarray(embedding, dtype="float32")
-            if vec.shape[0] != self.dim:
-                # Try to pad or trim
-                v = np.zeros(self.dim, dtype="float32")
-                v[: min(self.dim, vec.shape[0])] = vec[: min(self.dim, vec.shape[0])]
-                vec = v
+    def _is_flat(self) -> bool:
+        inner = getattr(self._index, "index", None)
+        return inner is not None and isinstance(faiss.downcast_index(inner), faiss.IndexFlat)
 
-            if _FAISS_AVAILABLE:
+    def _maybe_migrate(self):
+        """Rebuild the flat index as `index_spec` once the corpus is large enough.
+
+        Runs under the lock: training and re-adding block writers and searches
+        for its duration, but only happens once per index.
+        """
+        if not self._migrate_pending or self._index.ntotal < self.migrate_threshold:
+            return
+        self._migrate_pending = False
+        flat = faiss.downcast_index(self._index.index)
+        n = flat.ntotal
+        # zero-copy view over the flat index's storage
+        xb = faiss.rev_swig_ptr(flat.get_xb(), n * self.dim).reshape(n, self.dim)
+        ids = faiss.vector_to_array(self._index.id_map).astype("int64")
+        try:
+            target = faiss.index_factory(self.dim, self.index_spec, faiss.METRIC_INNER_PRODUCT)
+            if not target.is_trained:
+                sample = np.random.default_rng(0).choice(n, min(n, self.train_sample), replace=False)
+                sample.sort()
+                target.train(np.ascontiguousarray(xb[sample]))
+            migrated = self._with_ids(target)
+            for start in range(0, n, 65536):
+                migrated.add_with_ids(xb[start : start + 65536], ids[start : start + 65536])
+        except Exception:
+            logger.exception("Could not migrate FAISS index to %s; staying on Flat", self.index_spec)
+            return
+        logger.info("Migrated %d vectors from Flat to %s", n, self.index_spec)
+        self._index = migrated
+        self._dirty += n
+        self._wake.set()
+
+    def _search_params(self, nprobe: Optional[int], ef_search: Optional[int]):
+        inner = faiss.downcast_index(getattr(self._index, "index", self._index))
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search)
+        try:
+            faiss.extract_index_ivf(inner)
+        except Exception:
+            return None
+        return faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe)
+
+    # --- index snapshots -------------------------------------------------
+
+    def _index_ids(self) -> np.ndarray:
+        if not _FAISS_AVAILABLE:
+            return self._index.ids()
+        if hasattr(self._index, "id_map"):
+            ids = faiss.vector_to_array(self._index.id_map).astype("int64")
+            return ids[ids >= 0]
+        return self._ivf_ids(0, self._index.ntotal)
+
+    def _id_map_view(self) -> np.ndarray:
+        """Writable view over the IndexIDMap's row -> id array."""
+        return faiss.rev_swig_ptr(self._index.id_map.data(), self._index.ntotal)
+
+    def _ivf_ids(self, start: int, end: int) -> np.ndarray:
+        """Ids of rows [start, end) of an id-native IVF index, in inverted-list order."""
+        try:
+            ivf = faiss.extract_index_ivf(self._index)
+        except Exception:
+            # plain index without ids: ids are the sequential row numbers
+            return np.arange(start, end, dtype="int64")
+        invlists = ivf.invlists
+        chunks = []
+        offset = 0
+        for list_no in range(ivf.nlist):
+            if offset >= end:
+                break
+            size = invlists.list_size(list_no)
+            if size and offset + size > start:
+                ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+                chunks.append(np.array(ids[max(start - offset, 0) : min(end - offset, size)], dtype="int64"))
+            offset += size
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype="int64")
+
+    def _tombstone(self, ids: np.ndarray) -> None:
+        """Hide the current rows of `ids` from search and export.
+
+        For indexes that cannot remove vectors (HNSW): the superseded rows stay
+        in the graph but their id is set to -1, which searches skip.
+        """
+        existing = [i for i in ids.tolist() if i in self._metastore]
+        if not existing or not hasattr(self._index, "id_map") or not self._index.ntotal:
+            return
+        labels = self._id_map_view()
+        hit = np.isin(labels, existing)
+        labels[hit] = -1
+        self._tombstones += int(hit.sum())
+
+    def _maybe_compact(self):
+        """Rebuild the index from its live rows once too many are tombstoned.
+
+        Dead rows still take part in graph search and can crowd out the live
+        copy of a re-upserted vector, and they never free their memory. Runs
+        under the lock.
+        """
+        total = self._index.ntotal
+        if not self._tombstones or self._tombstones < self.compact_ratio * total:
+            return
+        labels = self._id_map_view()
+        live = np.nonzero(labels >= 0)[0]
+        ids = np.array(labels[live], dtype="int64")
+        try:
+            xb = faiss.downcast_index(self._index.index).reconstruct_n(0, total)[live]
+            target = faiss.index_factory(self.dim, self.index_spec, faiss.METRIC_INNER_PRODUCT)
+            if not target.is_trained:
+                target.train(xb)
+            rebuilt = self._with_ids(target)
+            rebuilt.add_with_ids(xb, ids)
+        except RuntimeError:
+            logger.exception("Could not compact FAISS index %s", self.index_spec)
+            return
+        logger.info("Compacted FAISS index: dropped %d superseded rows", self._tombstones)
+        self._index = rebuilt
+        self._tombstones = 0
+        self._dirty += len(ids)
+        self._wake.set()
+
+    def _numpy_snapshot_paths(self):
+        return f"{self.index_path}.npy", f"{self.index_path}.ids.npy"
+
+    def _load_numpy_snapshot(self):
+        emb_path, ids_path = self._numpy_snapshot_paths()
+        if not (os.path.exists(emb_path) and os.path.exists(ids_path)):
+            return
+        try:
+            loaded = self._index.load(emb_path, ids_path)
+        except Exception:
+            logger.exception("Could not read numpy index snapshot %s", emb_path)
+            return
+        if not loaded:
+            # the two files come from different snapshots; start empty and let
+            # _reconcile drop the metadata that no longer has a vector
+            logger.warning("Ignoring inconsistent numpy index snapshot %s", emb_path)
+
+    def _reconcile(self):
+        """Drop metadata whose vector did not make it into the last index snapshot.
+
+        Vectors are only persisted by snapshots while metadata is logged on every
+        upsert, so after a crash the metadata can be ahead of the index. Those
+        entries are removed (and the removal logged) so search results and the
+        metadata store agree; their sources need to be re-indexed.
+        """
+        present = set(self._index_ids().tolist())
+        missing = [i for i in self._metastore if i not in present]
+        if not missing:
+            return
+        logger.warning(
+            "%d metadata entries have no vector in %s; dropping them", len(missing), self.index_path
+        )
+        for i in missing:
+            del self._metastore[i]
+        if self.read_only:
+            return
+        try:
+            self._metalog.append({}, deletes=missing)
+        except Exception:
+            logger.exception("Failed to persist FAISS metadata to %s", self.metadata_path)
+
+    def _snapshot_loop(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.snapshot_interval)
+            self._wake.clear()
+            if self._dirty:
                 try:
-                    self._index.remove_ids(np.array([id], dtype="int64"))
+                    self.snapshot()
                 except Exception:
-                    pass
-                # faiss expects 2D
-                self._index.add_with_ids(vec.reshape(1, -1), np.array([id], dtype="int64"))
+                    logger.exception("FAISS index snapshot failed")
+
+    def snapshot(self) -> None:
+        """Atomically write the current index to `index_path` (temp file + rename).
+
+        The FAISS index is serialized under the lock, so the snapshot is a
+        consistent point-in-time copy, and written to disk outside it. The numpy
+        fallback streams its buffer to disk while holding the lock instead of
+        copying a possibly memory-mapped corpus into RAM.
+        """
+        if not self.index_path or self.read_only:
+            return
+        with self._snapshot_lock:
+            if _FAISS_AVAILABLE:
+                with self._lock:
+                    dirty = self._dirty
+                    data = faiss.serialize_index(self._index)
+                _atomic_write(self.index_path, lambda fh: data.tofile(fh))
             else:
-                # fallback append
-                if getattr(self, "_embeddings", None) is None:
-                    self._embeddings = vec.reshape(1, -1)
-                    self._ids = [id]
+                emb_path, ids_path = self._numpy_snapshot_paths()
+                with self._lock:
+                    dirty = self._dirty
+                    self._index.save(emb_path + ".tmp", ids_path + ".tmp")
+                    os.replace(ids_path + ".tmp", ids_path)
+                    os.replace(emb_path + ".tmp", emb_path)
+
+            with self._lock:
+                self._dirty -= dirty
+
+    def close(self) -> None:
+        """Stop the snapshot thread, write a final snapshot if anything changed,
+        and release the store locks."""
+        if self._snapshot_thread is not None:
+            self._stopped.set()
+            self._wake.set()
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+            if self._dirty:
+                self.snapshot()
+        self._release_store_locks()
+
+    def _persist_metadata(self, ids: List[int]):
+        """Append the metadata for `ids` to the log, compacting when it grows large."""
+        try:
+            self._metalog.append({i: self._metastore[i] for i in ids})
+            if self._metalog.needs_compaction:
+                self._metalog.compact(self._metastore)
+        except Exception:
+            logger.exception("Failed to persist FAISS metadata to %s", self.metadata_path)
+
+    def _as_matrix(self, embeddings) -> np.ndarray:
+        """Coerce `embeddings` to a (n, dim) float32 matrix, padding or trimming columns."""
+        if isinstance(embeddings, (list, tuple)) and embeddings and len({len(e) for e in embeddings}) > 1:
+            # ragged rows (e.g. mixed embedding backends): pad each row separately
+            mat = np.zeros((len(embeddings), self.dim), dtype="float32")
+            for i, row in enumerate(embeddings):
+                n = min(self.dim, len(row))
+                mat[i, :n] = np.asarray(row[:n], dtype="float32")
+            return mat
+        mat = np.asarray(embeddings, dtype="float32")
+        if mat.ndim == 1:
+            mat = mat.reshape(1, -1)
+        if mat.shape[1] != self.dim:
+            m = np.zeros((mat.shape[0], self.dim), dtype="float32")
+            cols = min(self.dim, mat.shape[1])
+            m[:, :cols] = mat[:, :cols]
+            mat = m
+        return np.ascontiguousarray(mat)
+
+    def upsert(self, embedding: List[float], metadata: Dict[str, Any], id: Optional[int] = None) -> int:
+        """Upsert a single vector and metadata. Returns the assigned id."""
+        ids = None if id is None else [id]
+        return self.upsert_many([embedding], [metadata], ids=ids)[0]
+
+    def upsert_many(
+        self,
+        embeddings,
+        metadatas: List[Dict[str, Any]],
+        ids: Optional[List[Optional[int]]] = None,
+    ) -> List[int]:
+        """Upsert a batch of vectors and their metadata. Returns the assigned ids.
+
+        `embeddings` is a 2D array-like of shape (n, d). The whole batch costs a
+        single remove/add on the index and a single metadata flush.
+        """
+        if self.read_only:
+            raise RuntimeError(f"FAISS store {self.metadata_path} is open read-only")
+        if len(metadatas) == 0:
+            return []
+        mat = self._as_matrix(embeddings)
+        if mat.shape[0] != len(metadatas):
+            raise ValueError("embeddings and metadatas must have the same length")
+        if ids is not None and len(ids) != len(metadatas):
+            raise ValueError("ids and metadatas must have the same length")
+
+        with self._lock:
+            assigned: List[int] = []
+            for i in range(len(metadatas)):
+                _id = ids[i] if ids is not None else None
+                if _id is None:
+                    _id = self._next_id
+                    self._next_id += 1
                 else:
-                    self._embeddings = np.vstack([self._embeddings, vec.reshape(1, -1)])
-                    self._ids.append(id)
+                    _id = int(_id)
+                    self._next_id = max(self._next_id, _id + 1)
+                assigned.append(_id)
+
+            # A batch may repeat an id; the last occurrence wins, as with upsert()
+            last = {}
+            for row, _id in enumerate(assigned):
+                last[_id] = row
+            rows = sorted(last.values())
+            mat = mat[rows]
+            id_arr = np.array([assigned[r] for r in rows], dtype="int64")
 
-            self._metastore[id] = metadata
-            # persist metadata best-effort
-            self._persist_metadata()
-            return id
+            try:
+                self._index.remove_ids(id_arr)
+            except RuntimeError:
+                # the index cannot remove vectors (HNSW)
+                self._tombstone(id_arr)
+            self._index.add_with_ids(mat, id_arr)
+            if _FAISS_AVAILABLE:
+                self._maybe_migrate()
+                self._maybe_compact()
 
-    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+            for _id, md in zip(assigned, metadatas):
+                self._metastore[_id] = md
+            self.generation += 1
+            # persist metadata best-effort, once per batch
+            self._persist_metadata(id_arr.tolist())
+            self._dirty += len(id_arr)
+            if self._dirty >= self.snapshot_every:
+                self._wake.set()
+            return assigned
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
         """Return top_k results as list of {id, score, metadata}.
 
-        Scores are inner-product similarities (higher = better).
+        Scores are inner-product similarities (higher = better). `nprobe`
+        (IVF) and `ef_search` (HNSW) override the configured defaults for this
+        query and are ignored by exact indexes.
         """
-        vec = np.asarray(query_embedding, dtype="float32")
-        if vec.shape[0] != self.dim:
-            v = np.zeros(self.dim, dtype="float32")
-            v[: min(self.dim, vec.shape[0])] = vec[: min(self.dim, vec.shape[0])]
-            vec = v
+        return self.search_many([query_embedding], top_k=top_k, nprobe=nprobe, ef_search=ef_search)[0]
 
-        if _FAISS_AVAILABLE:
-            D, I = self._index.search(vec.reshape(1, -1), top_k)
-            ids = I[0].tolist()
-            scores = D[0].tolist()
-        else:
-            if getattr(self, "_embeddings", None) is None or self._embeddings.shape[0] == 0:
-                return []
-            # inner product
-            scores = (self._embeddings @ vec).tolist()
-            ids = self._ids
-            paired = list(zip(ids, scores))
-            paired.sort(key=lambda x: x[1], reverse=True)
-            paired = paired[:top_k]
-            ids = [p[0] for p in paired]
-            scores = [p[1] for p in paired]
+    def search_many(
+        self,
+        queries,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search a (q, d) batch of query embeddings with a single index call.
+
+        Returns one result list per query, in the same format as `search`.
+        The index call runs under the lock: neither FAISS nor the numpy
+        fallback may be searched while a writer changes it. FAISS already
+        spreads a single search across cores, so little is lost by
+        serializing them.
+        """
+        mat = self._as_matrix(queries)
+        if mat.shape[0] == 0:
+            return []
+        with self._lock:
+            if _FAISS_AVAILABLE:
+                D, I = self._search_live(mat, top_k, self._search_params(nprobe, ef_search))
+            else:
+                D, I = self._index.search(mat, top_k)
+        return [self._build_results(D[q], I[q], top_k) for q in range(len(I))]
+
+    def _search_live(self, mat: np.ndarray, top_k: int, params):
+        """Search the FAISS index, skipping tombstoned rows (caller holds the lock).
+
+        Superseded HNSW rows come back as -1. Queries that got fewer than
+        `top_k` live ids are searched again with twice the `k` until they have
+        enough or `k` covers the whole index.
+        """
+        index = self._index
 
+        def run(queries, k):
+            return index.search(queries, k, params=params) if params is not None else index.search(queries, k)
+
+        k = top_k + min(self._tombstones, top_k)
+        D, I = run(mat, k)
+        if not self._tombstones:
+            return D, I
+        D, I = list(D), list(I)
+        while k < index.ntotal:
+            short = [q for q in range(len(I)) if int((I[q] >= 0).sum()) < top_k]
+            if not short:
+                break
+            k = min(2 * k, index.ntotal)
+            D2, I2 = run(mat[short], k)
+            for row, q in enumerate(short):
+                D[q], I[q] = D2[row], I2[row]
+        return D, I
+
+    def _build_results(self, scores: np.ndarray, ids: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
         results = []
-        for _id, score in zip(ids, scores):
-            if _id == -1:
+        for _id, score in zip(ids.tolist(), scores.tolist()):
+            if _id < 0:
                 continue
             md = self._metastore.get(int(_id), {})
             results.append({"id": int(_id), "score": float(score), "metadata": md})
+            if len(results) == top_k:
+                break
         return results
 
+    # --- bulk export -----------------------------------------------------
+
+    def iter_vectors(
+        self, batch_size: int = 4096, with_vectors: bool = True
+    ) -> Iterator[Tuple[np.ndarray, Optional[np.ndarray], List[Dict[str, Any]]]]:
+        """Yield (ids, vectors, metadatas) batches covering the whole store.
+
+        Each batch is copied under the lock, so memory stays at one batch and
+        writers are only blocked briefly. Like a Mongo cursor this is not a
+        snapshot: vectors written or removed during the walk may be missed or
+        repeated. `vectors` is None when `with_vectors` is False or the index
+        cannot reconstruct its vectors (e.g. IVF without a direct map).
+        """
+        pos = 0
+        while True:
+            with self._lock:
+                ids, vectors, pos, done = self._read_rows(pos, batch_size, with_vectors)
+                metadatas = [self._metastore.get(int(i), {}) for i in ids.tolist()]
+            if len(ids):
+                yield ids, vectors, metadatas
+            if done:
+                return
+
+    def _read_rows(self, start: int, n: int, with_vectors: bool):
+        if not _FAISS_AVAILABLE:
+            ids, vectors, end = self._index.rows(start, n)
+            return ids, vectors if with_vectors else None, end, end >= self._index.slot_count
+        total = self._index.ntotal
+        end = min(start + n, total)
+        vectors = None
+        try:
+            if hasattr(self._index, "id_map"):
+                id_view = self._id_map_view() if total else np.empty(0, dtype="int64")
+                ids = np.array(id_view[start:end], dtype="int64")
+                live = ids >= 0  # drop superseded HNSW rows
+                ids = ids[live]
+                if with_vectors and end > start:
+                    vectors = faiss.downcast_index(self._index.index).reconstruct_n(start, end - start)[live]
+            else:
+                ids = self._ivf_ids(start, end)
+                if with_vectors and len(ids):
+                    vectors = self._index.reconstruct_batch(ids)
+        except RuntimeError:
+            vectors = None
+            if start == 0:
+                logger.warning("FAISS index %s cannot reconstruct vectors; exporting metadata only", self.index_spec)
+        return ids, vectors, end, end >= total
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        write(fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
 
 __all__ = ["FaissClient"]
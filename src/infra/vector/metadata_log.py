@@ -0,0 +1,113 @@
+"""Append-only metadata log used by `FaissClient`.
+
+Metadata lives in two files:
+
+* ``<path>``      -- a JSON snapshot ``{"<id>": metadata, ...}`` (the format the
+  client always wrote, so existing files keep loading);
+* ``<path>.log``  -- JSON lines appended since the last snapshot, one record per
+  upserted or deleted id.
+
+Appending a batch costs O(batch) instead of re-serializing the whole store.
+Once the log grows past ``compact_every`` records it is folded into a new
+snapshot (written to a temp file and renamed into place) and truncated. On
+startup the snapshot is loaded and the log replayed; a torn trailing record
+left by a crash is discarded.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataLog:
+    def __init__(self, path: str, compact_every: int = 10000, fsync: bool = True):
+        self.path = path
+        self.log_path = path + ".log"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._records = 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._records >= self.compact_every
+
+    def load(self, repair: bool = True) -> Dict[int, Dict[str, Any]]:
+        """Return the metadata store rebuilt from the snapshot plus the log.
+
+        With `repair` a torn tail is cut off the log; readers of a store
+        another process writes to pass False and just skip it.
+        """
+        store: Dict[int, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    for k, v in json.load(fh).items():
+                        store[int(k)] = v
+            except Exception:
+                logger.exception("Could not read metadata snapshot %s", self.path)
+
+        self._records = 0
+        if not os.path.exists(self.log_path):
+            return store
+
+        good_offset = 0
+        with open(self.log_path, "rb") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # torn write from a crash; everything after it is unusable
+                    logger.warning("Discarding torn metadata log tail at offset %d", good_offset)
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                good_offset += len(line)
+                self._records += 1
+                if rec.get("op") == "del":
+                    store.pop(int(rec["id"]), None)
+                else:
+                    store[int(rec["id"])] = rec["md"]
+
+        if repair and good_offset != os.path.getsize(self.log_path):
+            with open(self.log_path, "r+b") as fh:
+                fh.truncate(good_offset)
+        return store
+
+    def append(self, puts: Dict[int, Dict[str, Any]], deletes: Iterable[int] = ()) -> None:
+        """Durably append one batch of upserts/deletes to the log."""
+        lines = [json.dumps({"op": "put", "id": int(k), "md": v}) for k, v in puts.items()]
+        lines.extend(json.dumps({"op": "del", "id": int(k)}) for k in deletes)
+        if not lines:
+            return
+        with open(self.log_path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        self._records += len(lines)
+
+    def compact(self, store: Dict[int, Dict[str, Any]]) -> None:
+        """Write `store` as the new snapshot and truncate the log."""
+        _atomic_write_json(self.path, {str(k): v for k, v in store.items()}, fsync=self.fsync)
+        # a crash before this truncate only means the log is replayed again on
+        # top of a snapshot that already contains it, which is idempotent
+        with open(self.log_path, "w", encoding="utf-8"):
+            pass
+        self._records = 0
+
+
+def _atomic_write_json(path: str, data: Any, fsync: bool = True) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+        fh.flush()
+        if fsync:
+            os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+__all__ = ["MetadataLog"]
@@ -0,0 +1,166 @@
+"""Brute-force inner-product index used by `FaissClient` when FAISS is missing.
+
+It mirrors the small part of the FAISS API the client relies on
+(`add_with_ids`, `remove_ids`, `search`, `ntotal`) so both backends share the
+same code path.
+
+Vectors live in a preallocated float32 buffer whose capacity doubles when it
+fills up, so inserting n vectors costs O(n) amortized copies instead of the
+O(n^2) of re-stacking on every insert. The buffer can be backed by an
+`np.memmap` file so large corpora do not need to be RAM-resident. Ids are kept
+in a parallel int64 column; deleted rows are cleared in a liveness bitmap and
+their slots reused by later inserts.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_COPY_ROWS = 65536
+
+
+class NumpyIndex:
+    def __init__(self, dim: int, capacity: int = 1024, mmap_path: Optional[str] = None):
+        self.d = dim
+        self.mmap_path = mmap_path
+        self._size = 0  # slots in use, live or free
+        self._free: List[int] = []
+        self._slot: Dict[int, int] = {}
+        self._vectors = self._allocate(max(1, capacity))
+        self._ids = np.full(self._capacity, -1, dtype="int64")
+        self._live = np.zeros(self._capacity, dtype=bool)
+
+    @property
+    def ntotal(self) -> int:
+        return len(self._slot)
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        self._capacity = capacity
+        if self.mmap_path is None:
+            return np.zeros((capacity, self.d), dtype="float32")
+        # grow the backing file in place; existing rows keep their offsets
+        mode = "r+" if getattr(self, "_vectors", None) is not None else "w+"
+        if mode == "r+":
+            self._vectors.flush()
+            with open(self.mmap_path, "r+b") as fh:
+                fh.truncate(capacity * self.d * 4)
+        return np.memmap(self.mmap_path, dtype="float32", mode=mode, shape=(capacity, self.d))
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        old_capacity = self._capacity
+        if self.mmap_path is None:
+            vectors = self._allocate(capacity)
+            vectors[:old_capacity] = self._vectors
+            self._vectors = vectors
+        else:
+            self._vectors = self._allocate(capacity)
+        ids = np.full(capacity, -1, dtype="int64")
+        ids[:old_capacity] = self._ids
+        live = np.zeros(capacity, dtype=bool)
+        live[:old_capacity] = self._live
+        self._ids, self._live = ids, live
+
+    def _take_slots(self, n: int) -> np.ndarray:
+        reused = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        fresh = n - len(reused)
+        if fresh:
+            self._grow(self._size + fresh)
+        slots = np.empty(n, dtype="int64")
+        slots[: len(reused)] = reused
+        slots[len(reused):] = np.arange(self._size, self._size + fresh)
+        self._size += fresh
+        return slots
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.d)
+        ids = np.asarray(ids, dtype="int64")
+        self.remove_ids(ids)
+        slots = self._take_slots(len(ids))
+        self._vectors[slots] = vectors
+        self._ids[slots] = ids
+        self._live[slots] = True
+        for _id, slot in zip(ids.tolist(), slots.tolist()):
+            self._slot[_id] = slot
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        slots = [self._slot.pop(int(i)) for i in np.asarray(ids).ravel() if int(i) in self._slot]
+        if slots:
+            self._live[slots] = False
+            self._ids[slots] = -1
+            self._free.extend(slots)
+        return len(slots)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (D, I) arrays of shape (nq, k), padded with -1 ids like FAISS."""
+        queries = np.asarray(queries, dtype="float32").reshape(-1, self.d)
+        nq = queries.shape[0]
+        D = np.full((nq, k), -np.inf, dtype="float32")
+        I = np.full((nq, k), -1, dtype="int64")
+        if not self._slot or k <= 0:
+            return D, I
+        scores = queries @ self._vectors[: self._size].T
+        scores[:, ~self._live[: self._size]] = -np.inf
+        kk = min(k, self.ntotal)
+        # O(n) selection of the k best per row, then sort only those k
+        if kk < scores.shape[1]:
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), (nq, scores.shape[1]))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        slots = np.take_along_axis(top, order, axis=1)
+        D[:, :kk] = np.take_along_axis(top_scores, order, axis=1)
+        I[:, :kk] = self._ids[slots]
+        return D, I
+
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size][self._live[: self._size]]
+
+    def rows(self, start: int, n: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Copy the live (ids, vectors) among slots [start, start + n).
+
+        Returns the slot to continue from; iteration is done once it reaches
+        `slot_count`.
+        """
+        end = min(start + n, self._size)
+        slots = np.flatnonzero(self._live[start:end]) + start
+        return self._ids[slots].copy(), np.array(self._vectors[slots]), end
+
+    @property
+    def slot_count(self) -> int:
+        return self._size
+
+    def save(self, vectors_path: str, ids_path: str) -> None:
+        """Write the live vectors and their ids as two `.npy` files.
+
+        Rows are streamed in chunks into an `open_memmap` file so saving never
+        materializes a second full copy of the buffer.
+        """
+        slots = np.flatnonzero(self._live[: self._size])
+        out = np.lib.format.open_memmap(vectors_path, mode="w+", dtype="float32", shape=(len(slots), self.d))
+        for start in range(0, len(slots), _COPY_ROWS):
+            chunk = slots[start : start + _COPY_ROWS]
+            out[start : start + len(chunk)] = self._vectors[chunk]
+        out.flush()
+        del out
+        with open(ids_path, "wb") as fh:
+            np.save(fh, self._ids[slots])
+
+    def load(self, vectors_path: str, ids_path: str) -> bool:
+        """Load a snapshot written by `save`; returns False if it is unusable."""
+        vectors = np.load(vectors_path, mmap_mode="r")
+        ids = np.load(ids_path)
+        if vectors.ndim != 2 or vectors.shape[1] != self.d or vectors.shape[0] != ids.shape[0]:
+            return False
+        for start in range(0, len(ids), _COPY_ROWS):
+            self.add_with_ids(vectors[start : start + _COPY_ROWS], ids[start : start + _COPY_ROWS])
+        return True
+
+
+__all__ = ["NumpyIndex"]
@@ -1,14 +1,16 @@
 # src/processing/processor.py
 import re
-from src.processing.clean import clean_text
+from src.processing.clean import clean_text, parse_html
 from src.infra.mongo.client import MongoClientSingleton
-from src.infra.vector.faiss_client import FaissClient
-from src.rag.embeddings import get_embedding  # hash fallback or actual model
+from src.infra.mongo.bulk_writer import BulkUpsertWriter
+from src.rag.embeddings import get_embedding, embed_texts  # hash fallback or actual model
 from bson import ObjectId
-from src.rag.pipeline import get_faiss_client, chunk_text, embed_text
+from src.rag.pipeline import get_faiss_client, chunk_text, index_parsed_page, vector_id
 
 mongo = MongoClientSingleton().db
-faiss = FaissClient()
+quotes_writer = BulkUpsertWriter(mongo.quotes, key_fields=("url", "text"))
+book_images_writer = BulkUpsertWriter(mongo.book_images, key_fields=("image_url",))
+raw_pages_writer = BulkUpsertWriter(mongo.raw_pages, key_fields=("url",))
 
 def index_quote_item(item):
     """
@@ -20,65 +22,78 @@ def index_quote_item(item):
     parsed.url = item.url
     parsed.title = item.author
     parsed.fetched_at = item.scraped_at
-    ids = []
     client = get_faiss_client()
     chunks = chunk_text(parsed.main_text)
-    for idx, chunk in enumerate(chunks):
-        emb = embed_text(chunk)
-        metadata = {
+    if not chunks:
+        return []
+    embeddings = embed_texts(chunks)
+    metadatas = [
+        {
             "url": parsed.url,
             "title": parsed.title,
             "chunk_id": idx,
             "text": chunk,
             "fetched_at": parsed.fetched_at.isoformat(),
         }
-        vid = client.upsert(emb, metadata)
-        ids.append(vid)
-    return ids
+        for idx, chunk in enumerate(chunks)
+    ]
+    ids = [vector_id(parsed.url, idx) for idx in range(len(chunks))]
+    return client.upsert_many(embeddings, metadatas, ids=ids)
     
-def process_quote_item(item):
-    text = clean_text(item.text)
-    doc = {
-        "text": text,
+def _quote_doc(item):
+    return {
+        "text": clean_text(item.text),
         "author": item.author,
         "tags": item.tags,
         "url": item.url,
         "scraped_at": item.scraped_at
     }
 
-    # Update MongoDB
-    res = mongo.quotes.update_one(
-        {"url": item.url, "text": text},
-        {"$set": doc},
-        upsert=True
-    )
 
-    # Get document _id
-    if res.upserted_id:
-        doc_id = res.upserted_id
-    else:
-        existing = mongo.quotes.find_one({"url": item.url, "text": text}, {"_id": 1})
-        doc_id = existing["_id"] if existing else None
+def process_quote_item(item):
+    """Buffer one quote for the next bulk write and index it in FAISS.
+
+    The Mongo `_id` is not known until the batch is flushed; use
+    `process_quote_items` when the caller needs it.
+    """
+    doc = _quote_doc(item)
+    quotes_writer.add(doc)
 
     # Compute embedding
-    emb = get_embedding(text)
+    emb = get_embedding(doc["text"])
 
     # Upsert vector into FAISS
-    faiss.upsert(
+    get_faiss_client().upsert(
         embedding=emb,
-        metadata={"text": text, "author": item.author},
-        id=None  # optional, can auto-generate or convert ObjectId to int
+        metadata={"text": doc["text"], "author": item.author},
+        id=vector_id(doc["url"], doc["text"]),  # same key as the Mongo upsert
     )
 
-    return {"_id": doc_id, **doc}
+    return doc
+
 
+def process_quote_items(items):
+    """Store a page of quotes with one bulk write and one batched embedding.
 
-def process_book_image_item(item):
-    """
-    Store book image info in MongoDB.
-    Currently FAISS embedding is not used for images.
+    Returns the docs with `_id` set for newly inserted quotes (None for quotes
+    that already existed).
     """
-    doc = {
+    docs = [_quote_doc(item) for item in items]
+    if not docs:
+        return []
+    ids = quotes_writer.write(docs)
+
+    texts = [doc["text"] for doc in docs]
+    get_faiss_client().upsert_many(
+        embed_texts(texts),
+        [{"text": doc["text"], "author": doc["author"]} for doc in docs],
+        ids=[vector_id(doc["url"], doc["text"]) for doc in docs],
+    )
+    return [{"_id": doc_id, **doc} for doc_id, doc in zip(ids, docs)]
+
+
+def _book_image_doc(item):
+    return {
         "title": item.title,
         "price": item.price,
         "image_url": item.image_url,
@@ -87,10 +102,25 @@ def process_book_image_item(item):
         "scraped_at": item.scraped_at
     }
 
-    # Use update_one with $set instead of replace_one with $set to avoid errors
-    mongo.book_images.update_one(
-        {"image_url": item.image_url},
-        {"$set": doc},
-        upsert=True
-    )
+
+def process_book_image_item(item):
+    """
+    Store book image info in MongoDB (buffered; flushed by size or time).
+    Currently FAISS embedding is not used for images.
+    """
+    doc = _book_image_doc(item)
+    book_images_writer.add(doc)
     return doc
+
+
+def process_book_image_items(items):
+    """Store a page of books with a single bulk upsert."""
+    docs = [_book_image_doc(item) for item in items]
+    ids = book_images_writer.write(docs)
+    return [{"_id": doc_id, **doc} for doc_id, doc in zip(ids, docs)]
+
+
+def process_and_store(raw):
+    """Store a crawled RawPage (buffered) and index its text in FAISS."""
+    raw_pages_writer.add(raw.model_dump())
+    return index_parsed_page(parse_html(raw))
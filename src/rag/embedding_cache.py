@@ -0,0 +1,118 @@
+"""Content-addressed embedding cache.
+
+Embeddings are keyed on sha256(model, dim, normalized text), so the same
+quote or chunk is only sent to the embedding API once no matter which page,
+worker or process sees it. Lookups go through an in-process LRU first and then
+a SQLite file (`EMBEDDING_CACHE_PATH`) that the API and the scraper workers can
+share; SQLite's WAL mode lets several processes read while one writes.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from prometheus_client import Counter
+
+from src.common.cache import LRUCache
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+
+CACHE_HITS = Counter("embedding_cache_hits_total", "Embedding cache hits", ["tier"])
+CACHE_MISSES = Counter("embedding_cache_misses_total", "Embedding cache misses")
+
+_SQLITE_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(model: str, dim: int, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\x00{dim}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Optional[str] = EMBEDDING_CACHE_PATH, maxsize: int = EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self._lru = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+            self._conn.commit()
+        self.disk_hits = 0
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the cached vectors for whichever of `keys` are present.
+
+        Hits and misses are counted per lookup, so a key repeated in `keys`
+        counts once per occurrence.
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        missing: List[bytes] = []
+        for key in keys:
+            vec = self._lru.get(key)
+            if vec is None:
+                missing.append(key)
+            else:
+                found[key] = vec
+        CACHE_HITS.labels(tier="memory").inc(len(keys) - len(missing))
+
+        if missing and self._conn is not None:
+            unique = list(dict.fromkeys(missing))
+            with self._lock:
+                for start in range(0, len(unique), _SQLITE_BATCH):
+                    chunk = unique[start : start + _SQLITE_BATCH]
+                    rows = self._conn.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vec = np.frombuffer(blob, dtype="float32")
+                        found[key] = vec
+                        self._lru.set(key, vec)
+            disk = sum(1 for key in missing if key in found)
+            self.disk_hits += disk
+            CACHE_HITS.labels(tier="disk").inc(disk)
+        CACHE_MISSES.inc(sum(1 for key in missing if key not in found))
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        for key, vec in items.items():
+            self._lru.set(key, np.asarray(vec, dtype="float32"))
+        if self._conn is not None and items:
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                    [(k, np.asarray(v, dtype="float32").tobytes()) for k, v in items.items()],
+                )
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self._lru.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self._lru.misses - self.disk_hits,
+            "memory_entries": len(self._lru),
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+__all__ = ["EmbeddingCache", "get_embedding_cache", "cache_key", "normalize_text"]
@@ -1,13 +1,23 @@
-from typing import List
+from typing import Dict, List, Optional
 import os
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from dotenv import load_dotenv
 
+from src.rag.embedding_cache import cache_key, get_embedding_cache
+
 # Load environment variables
 load_dotenv()
 
 
 GEMINI_KEY = os.getenv("API_KEY")
+EMBED_MODEL = "models/embedding-001"  # standard Gemini embedding model
+# Gemini's batch embedding endpoint accepts up to 100 texts per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "100"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_DIM = int(os.getenv("EMBED_DIM", "768"))
 
 _HAS_GEMINI = False
 
@@ -43,22 +53,119 @@ def embed_text(text: str, dim: int = 1536) -> List[float]:
     """
 
     if _HAS_GEMINI:
+        cache = get_embedding_cache()
+        key = cache_key(EMBED_MODEL, EMBED_DIM, text)
+        cached = cache.get_many([key])
+        if cached:
+            return cached[key].tolist()
         try:
             resp = gemini.embed_content(
-                model="models/embedding-001",  # standard Gemini embedding model
+                model=EMBED_MODEL,
                 content=text
             )
+            emb = None
             if isinstance(resp, dict) and "embedding" in resp:
-                return resp["embedding"]
+                emb = resp["embedding"]
             elif hasattr(resp, "embedding"):
-                return resp.embedding
+                emb = resp.embedding
+            if emb is not None:
+                cache.put_many({key: np.asarray(emb, dtype="float32")})
+                return emb
         except Exception as e:
             print(f"[WARN] Gemini embedding failed: {e}")
 
     return _hash_embedding(text)
 
 
-__all__ = ["embed_text"]
+def get_embedding(text: str) -> List[float]:
+    """Embed a single text; alias of `embed_text` used by the processor and API."""
+    return embed_text(text)
+
+
+def _hash_embeddings(texts: List[str]) -> np.ndarray:
+    """Vectorized `_hash_embedding`: one (n, 8) matrix for a list of texts."""
+    if not texts:
+        return np.zeros((0, 8), dtype="float32")
+    digests = b"".join(hashlib.sha256(t.encode("utf-8")).digest() for t in texts)
+    # each 8-hex-char slice of the digest is one big-endian uint32
+    words = np.frombuffer(digests, dtype=">u4").reshape(len(texts), 8)
+    out = (words % 1000).astype("float32") / 1000.0
+    out[[i for i, t in enumerate(texts) if not t]] = 0.0
+    return out
+
+
+def _embed_batch(texts: List[str]) -> Optional[List[List[float]]]:
+    """Embed one batch with a single Gemini request; None if the request failed."""
+    try:
+        resp = gemini.embed_content(model=EMBED_MODEL, content=texts)
+        emb = resp["embedding"] if isinstance(resp, dict) else resp.embedding
+        if len(emb) == len(texts):
+            return emb
+    except Exception as e:
+        print(f"[WARN] Gemini batch embedding failed: {e}")
+    return None
+
+
+def embed_texts(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> np.ndarray:
+    """Embed many texts at once and return a (len(texts), d) float32 matrix.
+
+    Texts are sent to Gemini in batches of `batch_size`, with up to
+    `concurrency` requests in flight. Without a Gemini key the whole list is
+    hashed in one vectorized pass. Texts already in the embedding cache are
+    not sent at all. Rows from different backends (e.g. a batch that fell back
+    to hashing) are zero-padded to a common width.
+    """
+    texts = list(texts)
+    if not _HAS_GEMINI:
+        return _hash_embeddings(texts)
+
+    cache = get_embedding_cache()
+    keys = [cache_key(EMBED_MODEL, EMBED_DIM, t) for t in texts]
+    cached = cache.get_many(keys)
+    rows: List = [cached.get(k) for k in keys]
+    # embed each distinct uncached text once
+    todo: Dict[bytes, str] = {}
+    for key, text, row in zip(keys, texts, rows):
+        if row is None:
+            todo.setdefault(key, text)
+
+    if todo:
+        todo_keys = list(todo)
+        todo_texts = list(todo.values())
+        batch_size = batch_size or EMBED_BATCH_SIZE
+        concurrency = concurrency or EMBED_CONCURRENCY
+        batches = [todo_texts[i : i + batch_size] for i in range(0, len(todo_texts), batch_size)]
+        if len(batches) <= 1 or concurrency <= 1:
+            results = [_embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+                results = list(pool.map(_embed_batch, batches))
+
+        fresh: Dict[bytes, List[float]] = {}
+        embedded: Dict[bytes, List[float]] = {}
+        for b, (batch, result) in enumerate(zip(batches, results)):
+            batch_keys = todo_keys[b * batch_size : b * batch_size + len(batch)]
+            if result is None:
+                # only real model output is cached, never the hash fallback
+                result = _hash_embeddings(batch).tolist()
+            else:
+                fresh.update(zip(batch_keys, result))
+            embedded.update(zip(batch_keys, result))
+        cache.put_many({k: np.asarray(v, dtype="float32") for k, v in fresh.items()})
+        rows = [embedded[k] if row is None else row for k, row in zip(keys, rows)]
+
+    width = max((len(r) for r in rows), default=8)
+    out = np.zeros((len(rows), width), dtype="float32")
+    for i, row in enumerate(rows):
+        out[i, : len(row)] = row
+    return out
+
+
+__all__ = ["embed_text", "embed_texts", "get_embedding"]
 
 if __name__ == "__main__":
     print("Testing embedding generator...\n")
@@ -1,19 +1,75 @@
-from typing import List
+from typing import AsyncIterator, List, Optional
+import asyncio
 import os
 import hashlib
 import struct
 from dotenv import load_dotenv
 load_dotenv()
 from google.generativeai import configure, GenerativeModel
+from src.rag.summary_cache import get_summary_cache, summary_key
 
 api_key = os.getenv("API_KEY")
 configure(api_key=api_key)
-model = GenerativeModel("gemini-1.5-flash")
+MODEL_NAME = "gemini-1.5-flash"
+model = GenerativeModel(MODEL_NAME)
+
+PROMPT_TEMPLATE = "Summarize the following text in a coherent, informative paragraph:\n{text}"
+
+def _build_prompt(chunks: list[str]) -> str:
+    return PROMPT_TEMPLATE.format(text="\n\n".join(chunks))
+
+def _cache_key(chunks: list[str]) -> str:
+    return summary_key(MODEL_NAME, PROMPT_TEMPLATE, chunks)
+
+async def _cached_async(key: str) -> Optional[str]:
+    cache = get_summary_cache()
+    summary = cache.get_local(key)
+    if summary is None and cache.persistent:
+        summary = await asyncio.to_thread(cache.get, key)
+    return summary
+
+async def _store_async(key: str, summary: str) -> None:
+    cache = get_summary_cache()
+    if cache.persistent:
+        await asyncio.to_thread(cache.set, key, summary)
+    else:
+        cache.set(key, summary)
 
 def summarize_with_gemini(chunks: list[str]) -> str:
-    text = "\n\n".join(chunks)
-    prompt = f"Summarize the following text in a coherent, informative paragraph:\n{text}"
-    response = model.generate_content(prompt)
-    return getattr(response, "text", str(response))
+    key = _cache_key(chunks)
+    summary = get_summary_cache().get(key)
+    if summary is None:
+        response = model.generate_content(_build_prompt(chunks))
+        summary = getattr(response, "text", str(response))
+        get_summary_cache().set(key, summary)
+    return summary
+
+async def summarize_with_gemini_async(chunks: list[str]) -> str:
+    """Non-blocking variant of `summarize_with_gemini` for async handlers."""
+    key = _cache_key(chunks)
+    summary = await _cached_async(key)
+    if summary is None:
+        response = await model.generate_content_async(_build_prompt(chunks))
+        summary = getattr(response, "text", str(response))
+        await _store_async(key, summary)
+    return summary
 
+async def stream_summary(chunks: list[str]) -> AsyncIterator[str]:
+    """Yield the summary text piece by piece as Gemini generates it.
 
+    A cached summary is yielded in one piece; a freshly streamed one is cached
+    once the stream completes.
+    """
+    key = _cache_key(chunks)
+    summary = await _cached_async(key)
+    if summary is not None:
+        yield summary
+        return
+    response = await model.generate_content_async(_build_prompt(chunks), stream=True)
+    parts = []
+    async for part in response:
+        text = getattr(part, "text", "")
+        if text:
+            parts.append(text)
+            yield text
+    await _store_async(key, "".join(parts))
@@ -1,10 +1,11 @@
 """RAG pipeline: chunk parsed pages, embed chunks, and index using FAISS client."""
 from typing import List
+import hashlib
 import math
 import os
 
 from src.infra.vector.faiss_client import FaissClient
-from src.rag.embeddings import embed_text
+from src.rag.embeddings import embed_texts
 from src.common.models import ParsedPage
 
 # Configuration
@@ -20,13 +21,31 @@ CHUNK_SIZE = int(os.environ.get("RAG_CHUNK_SIZE", "1000"))
 _faiss_client: FaissClient | None = None
 
 
-def get_faiss_client() -> FaissClient:
+def get_faiss_client(read_only: bool = False) -> FaissClient:
+    """The process-wide client; `read_only` only matters on the first call.
+
+    Search-only processes (the API) open it read-only first so they can run
+    next to the process that writes the store.
+    """
     global _faiss_client
     if _faiss_client is None:
-        _faiss_client = FaissClient(dim=FAISS_DIM, index_path=FAISS_INDEX_PATH, metadata_path=FAISS_METADATA_PATH)
+        _faiss_client = FaissClient(
+            dim=FAISS_DIM, index_path=FAISS_INDEX_PATH, metadata_path=FAISS_METADATA_PATH, read_only=read_only
+        )
     return _faiss_client
 
 
+def vector_id(*key) -> int:
+    """Stable FAISS id for a chunk, e.g. ``vector_id(url, chunk_id)``.
+
+    Re-indexing the same source (a re-crawl, or a retried or speculative
+    crawl task) then replaces its vectors instead of adding copies. Ids are
+    62-bit so auto-assigned ids after them still fit in int64.
+    """
+    digest = hashlib.blake2b("\x1f".join(map(str, key)).encode("utf-8"), digest_size=8).digest()
+    return (int.from_bytes(digest, "big") & ((1 << 62) - 1)) or 1
+
+
 def chunk_text(text: str, size: int = CHUNK_SIZE) -> List[str]:
     if not text:
         return []
@@ -36,24 +55,27 @@ def chunk_text(text: str, size: int = CHUNK_SIZE) -> List[str]:
 
 def index_parsed_page(parsed: ParsedPage) -> List[int]:
     """Index a ParsedPage by chunking `main_text`, embedding each chunk and
-    upserting into the FAISS client. Returns list of vector ids created.
+    upserting into the FAISS client under `vector_id(url, chunk_id)`.
+    Returns the vector ids.
     """
     client = get_faiss_client()
     text = parsed.main_text or ""
     chunks = chunk_text(text)
-    ids = []
-    for idx, chunk in enumerate(chunks):
-        emb = embed_text(chunk, dim=FAISS_DIM)
-        metadata = {
+    if not chunks:
+        return []
+    embeddings = embed_texts(chunks)
+    metadatas = [
+        {
             "url": parsed.url,
             "title": parsed.title,
             "chunk_id": idx,
             "text": chunk[:2000],
             "fetched_at": parsed.fetched_at.isoformat(),
         }
-        vid = client.upsert(emb, metadata)
-        ids.append(vid)
-    return ids
+        for idx, chunk in enumerate(chunks)
+    ]
+    ids = [vector_id(parsed.url, idx) for idx in range(len(chunks))]
+    return client.upsert_many(embeddings, metadatas, ids=ids)
 
 
-__all__ = ["index_parsed_page", "get_faiss_client"]
+__all__ = ["index_parsed_page", "get_faiss_client", "vector_id"]
@@ -1,13 +1,9 @@
 # src/rag/search_and_summarize.py
-from src.rag.embeddings import embed_text
-from src.rag.llm import summarize_with_gemini
-from src.rag.pipeline import get_faiss_client  # your pipeline
-from typing import List
+from src.rag.llm import stream_summary, summarize_with_gemini, summarize_with_gemini_async
+from src.rag.search_cache import cached_search, cached_search_async
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
-def search_and_summarize(query: str, top_k: int = 5, summary_k: int = 3):
-    faiss = get_faiss_client()
-    q_emb = embed_text(query)
-    results = faiss.search(q_emb, top_k=top_k)  # expects (id, score, metadata) list
+def _top_chunks(results, summary_k: int) -> List[str]:
     # If your faiss.search returns raw tuples, normalize to a list of metadata
     top_chunks = []
     for r in results[:summary_k]:
@@ -15,5 +11,32 @@ def search_and_summarize(query: str, top_k: int = 5, summary_k: int = 3):
         meta = r.get("metadata") if isinstance(r, dict) else r[2]
         text = meta.get("text") if isinstance(meta, dict) else str(meta)
         top_chunks.append(text)
-    summary = summarize_with_gemini(top_chunks)
+    return top_chunks
+
+def search_and_summarize(query: str, top_k: int = 5, summary_k: int = 3):
+    results = cached_search(query, top_k=top_k)  # expects (id, score, metadata) list
+    summary = summarize_with_gemini(_top_chunks(results, summary_k))
     return {"query": query, "results": results, "summary": summary}
+
+async def search_and_summarize_async(query: str, top_k: int = 5, summary_k: int = 3, executor=None, embed_executor=None):
+    """Async variant: the query is embedded on `embed_executor` and searched on
+    `executor` (the loop's default pool if None), and the summary is awaited
+    from Gemini's async client."""
+    results = await cached_search_async(query, top_k=top_k, embed_executor=embed_executor, search_executor=executor)
+    summary = await summarize_with_gemini_async(_top_chunks(results, summary_k))
+    return {"query": query, "results": results, "summary": summary}
+
+async def search_and_stream(
+    query: str, top_k: int = 5, summary_k: int = 3, executor=None, summarizer=stream_summary, embed_executor=None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Yield ("results", ...) as soon as the vector search finishes, then one
+    ("summary", {"text": ...}) per generated piece and a final ("done", {}).
+
+    `summarizer` is any async generator over the chunk texts; tests can pass a
+    local fake instead of the Gemini stream.
+    """
+    results = await cached_search_async(query, top_k=top_k, embed_executor=embed_executor, search_executor=executor)
+    yield "results", {"query": query, "results": results}
+    async for text in summarizer(_top_chunks(results, summary_k)):
+        yield "summary", {"text": text}
+    yield "done", {}
@@ -0,0 +1,78 @@
+"""Result cache for semantic search queries.
+
+Search traffic is dominated by repeated queries, so results are cached on
+(normalized query, top_k, index generation). `FaissClient` bumps its
+generation on every upsert, which makes entries computed against an older
+index unreachable; they then age out of the LRU. The TTL bounds staleness when
+the index is updated by another process (e.g. the scraper workers). Concurrent
+identical queries are collapsed so only one of them embeds and scans.
+
+`cached_search_async` is the variant for the API: it embeds on one executor
+and scans on another, so the embedding API's latency does not tie up the
+CPU-sized search pool.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from src.common.cache import LRUCache, SingleFlight
+from src.infra.vector.faiss_client import FaissClient
+from src.rag.embedding_cache import normalize_text
+from src.rag.embeddings import embed_text
+from src.rag.pipeline import get_faiss_client
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "4096"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+
+_results = LRUCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+_flight = SingleFlight()
+
+
+def cached_search(query: str, top_k: int = 5, client: Optional[FaissClient] = None) -> List[Dict[str, Any]]:
+    """Embed `query` and search the index, reusing cached results when possible."""
+    client = client or get_faiss_client()
+    query = normalize_text(query)
+    key = (query, top_k, client.generation)
+    results = _results.get(key)
+    if results is not None:
+        return results
+
+    return _flight.do(key, lambda: _search(client, key, embed_text(query), top_k))
+
+
+async def cached_search_async(
+    query: str,
+    top_k: int = 5,
+    client: Optional[FaissClient] = None,
+    embed_executor: Optional[Executor] = None,
+    search_executor: Optional[Executor] = None,
+) -> List[Dict[str, Any]]:
+    """Like `cached_search`, with the embedding on `embed_executor` and the scan
+    on `search_executor` (the loop's default pool for either if None).
+
+    Concurrent identical queries share one scan; each may embed, but the
+    embedding cache absorbs repeats.
+    """
+    client = client or get_faiss_client()
+    query = normalize_text(query)
+    key = (query, top_k, client.generation)
+    results = _results.get(key)
+    if results is not None:
+        return results
+
+    loop = asyncio.get_running_loop()
+    vector = await loop.run_in_executor(embed_executor, embed_text, query)
+    return await loop.run_in_executor(
+        search_executor, _flight.do, key, partial(_search, client, key, vector, top_k)
+    )
+
+
+def _search(client: FaissClient, key, vector, top_k: int) -> List[Dict[str, Any]]:
+    found = client.search(vector, top_k=top_k)
+    _results.set(key, found)
+    return found
+
+
+__all__ = ["cached_search", "cached_search_async"]
@@ -0,0 +1,83 @@
+"""Cache of LLM summaries keyed by the retrieved chunk set.
+
+Different queries often retrieve the same top chunks, and the summary only
+depends on those chunks and the prompt. Summaries are therefore keyed on a
+hash of (model, prompt template, ordered chunk texts) and kept in an LRU with
+a TTL. Setting `SUMMARY_CACHE_MONGO=1` adds a persistent tier in the
+`summary_cache` collection (expired by a Mongo TTL index) so the cache is
+shared across API replicas and restarts.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from src.common.cache import LRUCache
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "2048"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "86400"))
+SUMMARY_CACHE_MONGO = os.getenv("SUMMARY_CACHE_MONGO", "0") == "1"
+SUMMARY_CACHE_COLLECTION = os.getenv("SUMMARY_CACHE_COLLECTION", "summary_cache")
+
+
+def summary_key(model: str, template: str, chunks: List[str]) -> str:
+    h = hashlib.sha256()
+    for part in (model, template, *chunks):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, maxsize: int = SUMMARY_CACHE_SIZE, ttl: float = SUMMARY_CACHE_TTL, collection=None):
+        self.ttl = ttl
+        self._lru = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.collection = collection
+        if collection is not None:
+            try:
+                collection.create_index("created_at", expireAfterSeconds=int(ttl))
+            except Exception:
+                # best effort; an existing index with other options is fine
+                pass
+
+    @property
+    def persistent(self) -> bool:
+        return self.collection is not None
+
+    def get_local(self, key: str) -> Optional[str]:
+        return self._lru.get(key)
+
+    def get(self, key: str) -> Optional[str]:
+        summary = self._lru.get(key)
+        if summary is None and self.collection is not None:
+            doc = self.collection.find_one({"_id": key}, {"summary": 1})
+            if doc:
+                summary = doc["summary"]
+                self._lru.set(key, summary)
+        return summary
+
+    def set(self, key: str, summary: str) -> None:
+        self._lru.set(key, summary)
+        if self.collection is not None:
+            self.collection.update_one(
+                {"_id": key},
+                {"$set": {"summary": summary, "created_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+
+
+_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> SummaryCache:
+    global _cache
+    if _cache is None:
+        collection = None
+        if SUMMARY_CACHE_MONGO:
+            from src.infra.mongo.client import MongoClientSingleton
+            collection = MongoClientSingleton().db[SUMMARY_CACHE_COLLECTION]
+        _cache = SummaryCache(collection=collection)
+    return _cache
+
+
+__all__ = ["SummaryCache", "get_summary_cache", "summary_key"]
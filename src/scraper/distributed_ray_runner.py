@@ -1,98 +1,318 @@
+import atexit
 import os
+import statistics
 import sys
-from typing import List, Optional
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 import ray
 
-def chunk_list(items: List[str], num_chunks: int) -> List[List[str]]:
-    if num_chunks <= 1 or len(items) <= 1:
-        return [items]
-    size = max(1, len(items) // num_chunks + (1 if len(items) % num_chunks else 0))
-    return [items[i : i + size] for i in range(0, len(items), size)]
-@ray.remote
-def _run_crawl_remote(urls: List[str]):
-    """Run Scrapy CrawlerProcess inside a Ray worker for the given shard of URLs.
 
-    Returns a small status dict so the caller can observe completion.
+RAY_MAX_PENDING_PER_ACTOR = int(os.environ.get("RAY_MAX_PENDING_PER_ACTOR", "2"))
+RAY_TASK_SIZE = int(os.environ.get("RAY_TASK_SIZE", "4"))
+RAY_SPECULATE_FACTOR = float(os.environ.get("RAY_SPECULATE_FACTOR", "3.0"))
+RAY_SPECULATE_MIN_SECONDS = float(os.environ.get("RAY_SPECULATE_MIN_SECONDS", "5.0"))
+RAY_WAIT_TIMEOUT_SECONDS = 0.5
+
+
+def plan_tasks(urls: List[str], task_size: int = RAY_TASK_SIZE) -> List[List[str]]:
+    """Split `urls` into small tasks of at most `task_size` URLs from one host.
+
+    Keeping a task on one host lets the crawler reuse its connections; tasks
+    are interleaved across hosts so one slow site does not occupy every
+    actor at once.
     """
-    # Import heavy modules inside the worker to avoid serializing them
-    from scrapy.crawler import CrawlerProcess
-    from scrapy.utils.project import get_project_settings
-    from src.scraper.spiders.basic_spider import BasicSpider
-    from src.common.models import RawPage
-    from src.infra.mongo.client import insert_raw
-    from src.processing.processor import process_and_store
-
-    settings = get_project_settings()
-    process = CrawlerProcess(settings)
-    process.crawl(BasicSpider, start_urls=urls)
-
-    # Run crawl; the local shim returns a list of parsed items. Real Scrapy
-    # may return None because pipelines handle items. We support both.
-    items = process.start()
-
-    success = 0
-    failed = 0
-    errors = []
-
-    if not items:
-        # No items returned by the crawler (real Scrapy pipelines likely used).
-        return {"status": "completed", "count": 0, "urls": urls}
-
-    for it in items:
-        # Expecting item to be a dict with keys: url, status, html
-        try:
-            # Build RawPage model (will set fetched_at automatically)
-            raw = RawPage(url=it.get("url"), status=int(it.get("status", 0)), html=it.get("html", ""))
-        except Exception as exc:
-            failed += 1
-            errors.append(f"model_error:{str(exc)}")
-            continue
-
-        # Attempt to persist raw and process; retry once on failure
-        attempts = 0
-        max_attempts = 2
-        while attempts < max_attempts:
+    by_host: Dict[str, List[str]] = {}
+    for url in dict.fromkeys(urls):
+        by_host.setdefault(urlparse(url).netloc, []).append(url)
+    per_host = [
+        deque(host_urls[i : i + task_size] for i in range(0, len(host_urls), task_size))
+        for host_urls in by_host.values()
+    ]
+    tasks = []
+    while per_host:
+        for group in list(per_host):
+            tasks.append(group.popleft())
+            if not group:
+                per_host.remove(group)
+    return tasks
+
+
+@ray.remote(max_restarts=2, max_task_retries=1)
+class CrawlerWorker:
+    """Long-lived crawl worker.
+
+    Scrapy settings, the spider, the processing module (and with it the Mongo
+    client, bulk writers, FAISS client and embedding cache) are loaded once
+    when the actor starts instead of on every task. With the local crawler
+    shim the actor also keeps one event loop and one pooled HTTP client, so
+    keep-alive connections survive from one task to the next. Each actor writes its own
+    FAISS store (`<path>.worker<shard>`): a store allows a single writer.
+    """
+
+    def __init__(self, shard: int = 0):
+        for var, default in (("FAISS_METADATA_PATH", "faiss_metadata.json"), ("FAISS_INDEX_PATH", None)):
+            base = os.environ.get(var, default)
+            if base:
+                os.environ[var] = f"{base}.worker{shard}"
+
+        # Import heavy modules inside the worker to avoid serializing them
+        import asyncio
+        from scrapy.crawler import CrawlerProcess
+        from scrapy.utils.project import get_project_settings
+        from src.scraper.spiders.basic_spider import BasicSpider
+        from src.processing import processor
+
+        self.settings = get_project_settings()
+        self.spider_cls = BasicSpider
+        self.processor = processor
+        self.loop = asyncio.new_event_loop()
+        # real Scrapy runs its own reactor and has no reusable client
+        self.client = CrawlerProcess(self.settings).open_client() if hasattr(CrawlerProcess, "open_client") else None
+
+    def ping(self) -> bool:
+        return True
+
+    def crawl(self, urls: List[str]) -> dict:
+        """Crawl a shard of URLs and store/index every page.
+
+        Returns a small status dict so the caller can observe completion.
+        """
+        from scrapy.crawler import CrawlerProcess
+        from src.common.models import RawPage
+
+        process = CrawlerProcess(self.settings)
+        process.crawl(self.spider_cls, start_urls=urls)
+
+        # Run crawl; the local shim returns a list of parsed items. Real Scrapy
+        # may return None because pipelines handle items. We support both.
+        items = process.start(loop=self.loop, client=self.client) if self.client is not None else process.start()
+
+        success = 0
+        failed = 0
+        errors = []
+
+        if not items:
+            # No items returned by the crawler (real Scrapy pipelines likely used).
+            return {"status": "completed", "count": 0, "urls": urls}
+
+        for it in items:
+            # Expecting item to be a dict with keys: url, status, html
             try:
-                insert_raw(raw.dict())
-                process_and_store(raw)
-                success += 1
-                break
+                # Build RawPage model (will set fetched_at automatically)
+                raw = RawPage(url=it.get("url"), status=int(it.get("status", 0)), html=it.get("html", ""))
             except Exception as exc:
-                attempts += 1
-                if attempts >= max_attempts:
-                    failed += 1
-                    errors.append(str(exc))
-                else:
-                    # small backoff
-                    import time
+                failed += 1
+                errors.append(f"model_error:{str(exc)}")
+                continue
+
+            # Attempt to persist raw and process; retry once on failure
+            attempts = 0
+            max_attempts = 2
+            while attempts < max_attempts:
+                try:
+                    self.processor.process_and_store(raw)
+                    success += 1
+                    break
+                except Exception as exc:
+                    attempts += 1
+                    if attempts >= max_attempts:
+                        failed += 1
+                        errors.append(str(exc))
+                    else:
+                        # small backoff
+                        time.sleep(1)
 
-                    time.sleep(1)
+        try:
+            self.processor.raw_pages_writer.flush()
+        except Exception as exc:
+            errors.append(f"raw_store_error:{exc}")
+        return {"status": "completed", "success_count": success, "failed_count": failed, "errors": errors}
 
-    return {"status": "completed", "success_count": success, "failed_count": failed, "errors": errors}
 
-def run_distributed(urls: List[str], num_workers: int = 2, ray_address: Optional[str] = None) -> List[dict]:
-    """Shard `urls` into `num_workers` parts, submit each as a Ray task, and wait for completion.
+class CrawlerPool:
+    """A fixed set of `CrawlerWorker` actors shared by every batch.
 
-    If `ray_address` is None, we'll start a local Ray instance. If provided (e.g. 'auto' or 'ray://...'),
-    we'll connect to that cluster address instead.
+    Shards go to the actor with the fewest tasks in flight. At most
+    `max_pending_per_actor` tasks per actor may be outstanding; further
+    submissions block, which pushes back on the caller (e.g. the Kafka
+    consumer) instead of piling work up in the Ray scheduler. Safe to use from
+    several threads at once.
     """
-    init_kwargs = {"ignore_reinit_error": True}
-    if ray_address:
-        init_kwargs["address"] = ray_address
 
-    ray.init(**init_kwargs)
+    def __init__(self, num_workers: int, max_pending_per_actor: int = RAY_MAX_PENDING_PER_ACTOR):
+        self.actors = [CrawlerWorker.remote(shard) for shard in range(max(1, num_workers))]
+        ray.get([a.ping.remote() for a in self.actors])
+        self._load = [0] * len(self.actors)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(len(self.actors) * max_pending_per_actor)
+        # cancelled tasks that may still be running: ref -> actor index. A
+        # sync actor does not interrupt a running task on ray.cancel, so their
+        # slots are only released once ray.wait reports them finished.
+        self._orphans: Dict[Any, int] = {}
 
-    shards = chunk_list(urls, num_workers)    
-    futures = [_run_crawl_remote.remote(shard) for shard in shards if shard]
+    @property
+    def size(self) -> int:
+        return len(self.actors)
 
-    results = ray.get(futures)
-    if not ray_address:
+    def submit(self, urls: List[str], block: bool = True, avoid: Optional[int] = None):
+        """Start a crawl task; returns (ObjectRef, actor index).
+
+        Blocks while the pool is saturated, or returns None when `block` is
+        False. `avoid` steers the task away from one actor (used for
+        speculative copies of a straggler).
+        """
+        if not self._acquire(block):
+            return None
+        with self._lock:
+            candidates = [i for i in range(len(self.actors)) if i != avoid] or [avoid]
+            idx = min(candidates, key=self._load.__getitem__)
+            self._load[idx] += 1
+        return self.actors[idx].crawl.remote(urls), idx
+
+    def release(self, idx: int) -> None:
+        with self._lock:
+            self._load[idx] -= 1
+        self._slots.release()
+
+    def _acquire(self, block: bool) -> bool:
+        while True:
+            if self._slots.acquire(blocking=False):
+                return True
+            if self._reap():
+                continue
+            if not block:
+                return False
+            if self._slots.acquire(timeout=RAY_WAIT_TIMEOUT_SECONDS):
+                return True
+
+    def _orphan(self, ref, idx: int) -> None:
+        """Cancel a task whose result is no longer needed; its slot stays taken until it ends."""
+        with self._lock:
+            self._orphans[ref] = idx
         try:
-            ray.shutdown()
+            ray.cancel(ref)
         except Exception:
             pass
 
-    return results
+    def _reap(self) -> bool:
+        """Release the slots of orphaned tasks that have finished; True if any did."""
+        with self._lock:
+            refs = list(self._orphans)
+        if not refs:
+            return False
+        done, _ = ray.wait(refs, num_returns=len(refs), timeout=0)
+        for ref in done:
+            with self._lock:
+                idx = self._orphans.pop(ref, None)
+            if idx is not None:
+                self.release(idx)
+        return bool(done)
+
+    def map(self, tasks: List[List[str]]) -> List[dict]:
+        """Run every task and return the results in task order.
+
+        Tasks are fed to the actors as slots free up and collected with
+        `ray.wait` as they finish, so a slow task only delays itself. Once
+        nothing is left to hand out, a task running longer than
+        RAY_SPECULATE_FACTOR x the median task time so far is re-issued on
+        another actor; whichever copy finishes first wins and the other is
+        cancelled. Both copies index under the same ids (`vector_id`), so the
+        loser, if it still runs to completion, only rewrites the same rows.
+        """
+        queue = deque(range(len(tasks)))
+        results: List[Optional[dict]] = [None] * len(tasks)
+        running: Dict[Any, Tuple[int, int]] = {}  # ref -> (task, actor)
+        started: Dict[int, float] = {}
+        copies: Dict[int, List[Any]] = {}
+        durations: List[float] = []
+
+        def launch(i: int, block: bool, avoid: Optional[int] = None) -> bool:
+            submitted = self.submit(tasks[i], block=block, avoid=avoid)
+            if submitted is None:
+                return False
+            ref, idx = submitted
+            running[ref] = (i, idx)
+            started.setdefault(i, time.monotonic())
+            copies.setdefault(i, []).append(ref)
+            return True
+
+        while queue or running:
+            while queue and launch(queue[0], block=not running):
+                queue.popleft()
+
+            if not queue and durations and self.size > 1:
+                cutoff = max(RAY_SPECULATE_MIN_SECONDS, RAY_SPECULATE_FACTOR * statistics.median(durations))
+                now = time.monotonic()
+                for i, idx in list(running.values()):
+                    if len(copies[i]) == 1 and results[i] is None and now - started[i] > cutoff:
+                        launch(i, block=False, avoid=idx)
+
+            self._reap()
+            done, _ = ray.wait(list(running), num_returns=1, timeout=RAY_WAIT_TIMEOUT_SECONDS)
+            for ref in done:
+                i, idx = running.pop(ref)
+                self.release(idx)
+                if results[i] is not None:
+                    continue  # a speculative copy already finished
+                try:
+                    results[i] = ray.get(ref)
+                except Exception as exc:
+                    if any(other in running for other in copies[i]):
+                        continue  # let the other copy decide
+                    results[i] = {"status": "failed", "urls": tasks[i], "errors": [str(exc)]}
+                durations.append(time.monotonic() - started[i])
+                for other in copies[i]:
+                    if other in running:
+                        _, other_idx = running.pop(other)
+                        self._orphan(other, other_idx)
+        return results
+
+    def shutdown(self) -> None:
+        for actor in self.actors:
+            try:
+                ray.kill(actor)
+            except Exception:
+                pass
+        self.actors = []
+
+
+_pool: Optional[CrawlerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(num_workers: int = 2, ray_address: Optional[str] = None) -> CrawlerPool:
+    """Start Ray and the actor pool on first use; later calls reuse them."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            init_kwargs = {"ignore_reinit_error": True}
+            if ray_address:
+                init_kwargs["address"] = ray_address
+            ray.init(**init_kwargs)
+            _pool = CrawlerPool(num_workers)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def run_distributed(urls: List[str], num_workers: int = 2, ray_address: Optional[str] = None) -> List[dict]:
+    """Split `urls` into small per-host tasks, run them on the shared actor pool, and wait for completion.
+
+    If `ray_address` is None, a local Ray instance is started on first use. If provided (e.g. 'auto' or
+    'ray://...'), we connect to that cluster address instead. Ray and the actors stay up between calls.
+    """
+    pool = get_pool(num_workers, ray_address)
+    return pool.map(plan_tasks(urls))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+"""Background image download stage for the books spider.
+
+`ImageDownloader.submit` hands a download to a bounded thread pool and returns
+a future right away, so page parsing never waits on image bytes. Downloads are
+deduplicated twice:
+
+* by URL -- a URL submitted again shares the first future;
+* by content -- bodies are hashed (sha256) while they stream to disk, and a
+  cover whose bytes were already stored under another name is hard-linked to
+  that canonical file instead of being written a second time. Covers found
+  on disk without a manifest entry are hashed once so they take part too.
+
+ETag / Last-Modified validators are kept in a manifest next to the images
+(`.manifest.json`). With `revalidate=True`, files that already exist are
+re-checked with a conditional GET and only re-downloaded if the server
+answers something other than 304.
+
+Use `get_image_downloader` to share one downloader per directory within a
+process. Bodies and the manifest are written to unique temp files and
+renamed into place. The manifest is merged with the copy on disk under a
+lock file when saved, so downloaders in other processes do not drop each
+other's entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DOWNLOAD_WORKERS = int(os.getenv("IMAGE_DOWNLOAD_WORKERS", "8"))
+IMAGE_REVALIDATE = os.getenv("IMAGE_REVALIDATE", "0") == "1"
+
+_CHUNK = 64 * 1024
+
+
+class ImageDownloader:
+    def __init__(
+        self,
+        out_dir: str,
+        session: Optional[requests.Session] = None,
+        max_workers: int = IMAGE_DOWNLOAD_WORKERS,
+        revalidate: bool = IMAGE_REVALIDATE,
+    ):
+        self.out_dir = out_dir
+        self.revalidate = revalidate
+        os.makedirs(out_dir, exist_ok=True)
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-dl")
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self.manifest_path = os.path.join(out_dir, ".manifest.json")
+        # url -> {"path", "sha256", "etag", "last_modified"}
+        self._manifest: Dict[str, Dict[str, Optional[str]]] = self._load_manifest()
+        # sha256 -> canonical path
+        self._by_hash: Dict[str, str] = {
+            e["sha256"]: e["path"] for e in self._manifest.values() if e.get("sha256") and os.path.exists(e["path"])
+        }
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Optional[str]]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except Exception:
+            logger.exception("Could not read image manifest %s", self.manifest_path)
+            return {}
+
+    def submit(self, url: str, path: str) -> Future:
+        """Schedule `url` to be stored at `path`; resolves to the stored path."""
+        with self._lock:
+            future = self._futures.get(url)
+            if future is None:
+                future = self._futures[url] = self._pool.submit(self._download, url, path)
+        return future
+
+    def _download(self, url: str, path: str) -> str:
+        with self._lock:
+            entry = dict(self._manifest.get(url) or {})
+        if os.path.exists(path) and not self.revalidate:
+            if entry.get("path") != path:
+                self._adopt(url, path)
+            return path
+
+        headers = {}
+        if os.path.exists(path):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        digest = hashlib.sha256()
+        with self.session.get(url, stream=True, timeout=20, headers=headers) as r:
+            if r.status_code == 304:
+                return path
+            r.raise_for_status()
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    for chunk in r.iter_content(_CHUNK):
+                        fh.write(chunk)
+                        digest.update(chunk)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            validators = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+        sha = digest.hexdigest()
+        with self._lock:
+            canonical = self._by_hash.get(sha)
+            if canonical and os.path.abspath(canonical) != os.path.abspath(path) and os.path.exists(canonical):
+                os.remove(tmp)
+                self._forget_path(path)
+                _link_or_copy(canonical, path)
+            else:
+                os.replace(tmp, path)
+                self._forget_path(path)
+                self._by_hash[sha] = path
+            self._manifest[url] = {"path": path, "sha256": sha, **validators}
+        return path
+
+    def _adopt(self, url: str, path: str) -> None:
+        """Record a file already on disk (no validators) so content dedup can use it."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK), b""):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        with self._lock:
+            self._by_hash.setdefault(sha, path)
+            self._manifest[url] = {"path": path, "sha256": sha, "etag": None, "last_modified": None}
+
+    def _forget_path(self, path: str) -> None:
+        """Drop hash entries for `path`, whose content is being replaced (caller holds the lock).
+
+        Another file hard-linked to the old content, if any, becomes canonical.
+        """
+        for sha, canonical in list(self._by_hash.items()):
+            if os.path.abspath(canonical) != os.path.abspath(path):
+                continue
+            others = [
+                e["path"] for e in self._manifest.values()
+                if e.get("sha256") == sha and e["path"] != path and os.path.exists(e["path"])
+            ]
+            if others:
+                self._by_hash[sha] = others[0]
+            else:
+                del self._by_hash[sha]
+
+    def wait(self) -> None:
+        """Block until every submitted download finished; failures are logged.
+
+        Finished downloads are forgotten, so a shared downloader does not keep
+        one future per URL forever; a later submit of the same URL finds the
+        file on disk.
+        """
+        with self._lock:
+            futures = list(self._futures.items())
+        for url, future in futures:
+            exc = future.exception()
+            if exc is not None:
+                logger.warning("Image download failed for %s: %s", url, exc)
+        with self._lock:
+            for url, future in futures:
+                if self._futures.get(url) is future:
+                    del self._futures[url]
+        self._save_manifest()
+
+    def _save_manifest(self) -> None:
+        with self._save_lock, open(f"{self.manifest_path}.lock", "a") as lock_fh:
+            if fcntl is not None:
+                fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            on_disk = self._load_manifest()
+            with self._lock:
+                # entries written by other processes since we loaded
+                for url, entry in on_disk.items():
+                    self._manifest.setdefault(url, entry)
+                data = json.dumps(self._manifest)
+            fd, tmp = tempfile.mkstemp(dir=self.out_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(data)
+            os.replace(tmp, self.manifest_path)
+
+    def close(self) -> None:
+        self.wait()
+        self._pool.shutdown(wait=True)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+_downloaders: Dict[str, ImageDownloader] = {}
+_downloaders_lock = threading.Lock()
+
+
+def get_image_downloader(out_dir: str) -> ImageDownloader:
+    """The process-wide downloader for `out_dir`, created on first use."""
+    key = os.path.abspath(out_dir)
+    with _downloaders_lock:
+        downloader = _downloaders.get(key)
+        if downloader is None:
+            downloader = _downloaders[key] = ImageDownloader(out_dir)
+    return downloader
+
+
+__all__ = ["ImageDownloader", "get_image_downloader"]
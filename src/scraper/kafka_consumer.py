@@ -3,11 +3,13 @@ import os
 import signal
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Optional
 
-from confluent_kafka import Consumer, KafkaException
+from confluent_kafka import Consumer, KafkaException, TopicPartition
 
-from src.scraper.distributed_ray_runner import run_distributed
+from src.infra.kafka.offsets import OffsetTracker
+from src.scraper.distributed_ray_runner import get_pool, run_distributed
 
 
 # Configuration
@@ -16,6 +18,9 @@ KAFKA_TOPIC = os.environ.get("KAFKA_TOPIC", "urls")
 GROUP_ID = os.environ.get("KAFKA_GROUP", "rag-scraper-group")
 BATCH_SIZE = int(os.environ.get("KAFKA_BATCH_SIZE", "10"))
 BATCH_TIMEOUT_SECONDS = float(os.environ.get("KAFKA_BATCH_TIMEOUT", "5.0"))
+MAX_INFLIGHT_BATCHES = int(os.environ.get("KAFKA_MAX_INFLIGHT_BATCHES", "4"))
+COMMIT_INTERVAL_SECONDS = float(os.environ.get("KAFKA_COMMIT_INTERVAL", "1.0"))
+BATCH_RETRIES = int(os.environ.get("KAFKA_BATCH_RETRIES", "2"))
 
 
 running = True
@@ -55,7 +60,44 @@ def _extract_url_from_message(msg) -> Optional[str]:
         return None
 
 
+def _process_batch(batch, num_workers: int, tracker: OffsetTracker) -> int:
+    """Run one batch through Ray, retrying it a few times, then mark its
+    offsets done so the partition watermark can move past them."""
+    urls = [url for _, url in batch]
+    try:
+        for attempt in range(BATCH_RETRIES + 1):
+            try:
+                run_distributed(urls, num_workers=num_workers)
+                return len(urls)
+            except Exception as exc:
+                print(f"Processing failed for batch (attempt {attempt + 1}):", exc)
+                time.sleep(min(2 ** attempt, 10))
+        print(f"Giving up on batch of {len(urls)} urls")
+        return 0
+    finally:
+        for msg, _ in batch:
+            tracker.done(msg.topic(), msg.partition(), msg.offset())
+
+
+def _commit(consumer, tracker: OffsetTracker, asynchronous: bool = True) -> None:
+    offsets = [TopicPartition(t, p, o) for t, p, o in tracker.committable()]
+    if not offsets:
+        return
+    try:
+        consumer.commit(offsets=offsets, asynchronous=asynchronous)
+    except KafkaException as exc:
+        print("Offset commit failed:", exc)
+
+
 def consume_loop(group_id: str = GROUP_ID, topic: str = KAFKA_TOPIC, num_workers: int = 2):
+    """Consume URL batches with up to MAX_INFLIGHT_BATCHES running at once.
+
+    Batches are pulled with `consume()` and handed to a thread pool, so a slow
+    batch no longer stalls the ones behind it. Offsets are committed
+    asynchronously per partition, only up to the low watermark of finished
+    messages. While the pool is saturated the assignment is paused and the
+    loop keeps polling, which keeps the consumer in the group.
+    """
     cfg = {
         "bootstrap.servers": KAFKA_BOOTSTRAP,
         "group.id": group_id,
@@ -63,49 +105,73 @@ def consume_loop(group_id: str = GROUP_ID, topic: str = KAFKA_TOPIC, num_workers
         "enable.auto.commit": False,
     }
     consumer = Consumer(cfg)
-    consumer.subscribe([topic])
+    tracker = OffsetTracker()
+    paused = False
+
+    def on_assign(c, partitions):
+        # partitions handed over mid-rebalance must follow the current pause state
+        c.assign(partitions)
+        if paused:
+            c.pause(partitions)
+
+    def on_revoke(c, partitions):
+        _commit(c, tracker, asynchronous=False)
+        tracker.forget((tp.topic, tp.partition) for tp in partitions)
+
+    consumer.subscribe([topic], on_assign=on_assign, on_revoke=on_revoke)
 
     signal.signal(signal.SIGINT, _signal_handler)
     signal.signal(signal.SIGTERM, _signal_handler)
 
     print(f"Listening for URLs on topic '{topic}' (bootstrap={KAFKA_BOOTSTRAP})")
 
+    # start Ray and the crawler actors once, before the first batch arrives
+    get_pool(num_workers, os.environ.get("RAY_ADDRESS"))
+
+    executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT_BATCHES, thread_name_prefix="kafka-batch")
+    inflight = set()
+    last_commit = time.time()
+
     try:
         while running:
-            batch_msgs = []
-            batch_start = time.time()
-            # Collect up to BATCH_SIZE messages or until timeout
-            while len(batch_msgs) < BATCH_SIZE and (time.time() - batch_start) < BATCH_TIMEOUT_SECONDS:
-                msg = consumer.poll(0.5)
-                if msg is None:
-                    continue
+            if inflight:
+                finished, inflight = wait(inflight, timeout=0, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    print(f"Finished batch: {fut.result()} urls processed")
+
+            saturated = len(inflight) >= MAX_INFLIGHT_BATCHES
+            if saturated != paused:
+                assignment = consumer.assignment()
+                (consumer.pause if saturated else consumer.resume)(assignment)
+                paused = saturated
+
+            msgs = consumer.consume(num_messages=BATCH_SIZE, timeout=0.2 if paused else BATCH_TIMEOUT_SECONDS)
+            batch = []
+            for msg in msgs:
                 if msg.error():
                     print("Kafka message error:", msg.error())
                     continue
+                tracker.track(msg.topic(), msg.partition(), msg.offset())
                 url = _extract_url_from_message(msg)
                 if url:
-                    batch_msgs.append((msg, url))
-
-            if not batch_msgs:
-                continue
-
-            msgs, urls = zip(*batch_msgs)
-            urls = list(urls)
-            print(f"Got batch of {len(urls)} urls, submitting to Ray (workers={num_workers})")
-
-            try:
-                # Submit to runner (this will block until result returned)
-                run_distributed(list(urls), num_workers=num_workers)
-                # Commit offsets for the last message in each partition
-                # simple commit of the consumer's current positions
-                consumer.commit(asynchronous=False)
-                print(f"Committed offsets for {len(urls)} messages")
-            except Exception as exc:
-                print("Processing failed for batch:", exc)
-                # Do not commit offsets; messages will be reprocessed
-                time.sleep(1)
-
+                    batch.append((msg, url))
+                else:
+                    # nothing to do for empty / unparseable messages
+                    tracker.done(msg.topic(), msg.partition(), msg.offset())
+
+            if batch:
+                print(f"Got batch of {len(batch)} urls, submitting to Ray (workers={num_workers}, in flight={len(inflight) + 1})")
+                inflight.add(executor.submit(_process_batch, batch, num_workers, tracker))
+
+            if time.time() - last_commit >= COMMIT_INTERVAL_SECONDS:
+                _commit(consumer, tracker)
+                last_commit = time.time()
+
+        # drain: let running batches finish and commit what they completed
+        wait(inflight)
+        _commit(consumer, tracker, asynchronous=False)
     finally:
+        executor.shutdown(wait=True)
         consumer.close()
 
 
@@ -1,10 +1,32 @@
 # src/scraper/kafka_consumer_worker.py
-import os
+"""Kafka worker that crawls each URL message with a site-specific spider.
+
+Up to WORKER_CONCURRENCY messages are crawled at once on a thread pool, so
+one slow site only occupies one slot. A failed crawl is not retried inline:
+it is re-published to the retry topic with an attempt count and a
+not-before time, and after WORKER_MAX_ATTEMPTS it goes to the dead-letter
+topic. The worker consumes the retry topic too; a retry that is not due yet
+pauses its partition and rewinds to it, so waiting costs no thread.
+
+Offsets are committed per partition only up to the first message still in
+flight (`OffsetTracker`), and only after the retry/dead-letter messages
+produced so far are flushed, so a crash re-delivers unfinished work and
+never loses a failed URL.
+"""
 import json
 import logging
-from kafka import KafkaConsumer, KafkaProducer
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from prometheus_client import Counter, start_http_server
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional, Tuple
+
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+from prometheus_client import Counter, Gauge, start_http_server
+
+from src.infra.kafka.offsets import OffsetTracker
+from src.scraper import kafka_producer
+from src.scraper.kafka_producer import publish
 from src.scraper.spiders.quotes_spider import QuotesSpider
 from src.scraper.spiders.books_spider import BooksSpider
 
@@ -13,25 +35,31 @@ logger = logging.getLogger("scraper-worker")
 
 KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "localhost:9092")
 TOPIC = os.getenv("KAFKA_URL_TOPIC", "scrape-urls")
+RETRY_TOPIC = os.getenv("KAFKA_RETRY_TOPIC", "scrape-retry")
 DLQ_TOPIC = os.getenv("KAFKA_DLQ_TOPIC", "scrape-dead-letter")
 CONSUMER_GROUP = os.getenv("KAFKA_CONSUMER_GROUP", "scraper-group")
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+WORKER_RETRY_BACKOFF = float(os.getenv("WORKER_RETRY_BACKOFF", "2.0"))  # seconds, doubled per attempt
+WORKER_RETRY_BACKOFF_MAX = float(os.getenv("WORKER_RETRY_BACKOFF_MAX", "60.0"))
+WORKER_COMMIT_INTERVAL = float(os.getenv("WORKER_COMMIT_INTERVAL", "1.0"))
 
 # Prometheus metrics
 SCRAPES_SUCCEEDED = Counter("scrapes_succeeded_total", "Successful scrapes")
 SCRAPES_FAILED = Counter("scrapes_failed_total", "Failed scrapes")
 SCRAPES_RETRIED = Counter("scrapes_retried_total", "Retry attempts")
+SCRAPES_IN_FLIGHT = Gauge("scrapes_in_flight", "URLs currently being crawled")
+
+running = True
+
+TP = Tuple[str, int]
+
 
-producer = KafkaProducer(bootstrap_servers=KAFKA_BOOTSTRAP,
-                         value_serializer=lambda v: json.dumps(v).encode("utf-8"))
+def _signal_handler(sig, frame):
+    global running
+    logger.info("Shutting down worker...")
+    running = False
 
-consumer = KafkaConsumer(
-    TOPIC,
-    bootstrap_servers=KAFKA_BOOTSTRAP,
-    group_id=CONSUMER_GROUP,
-    value_deserializer=lambda v: json.loads(v.decode("utf-8")),
-    enable_auto_commit=False,  # commit only on success
-    auto_offset_reset="earliest"
-)
 
 def choose_spider_for_url(url: str):
     if "quotes.toscrape.com" in url:
@@ -42,8 +70,7 @@ def choose_spider_for_url(url: str):
     from src.scraper.spiders.basic_spider import BasicSpider
     return BasicSpider(start_url=url)
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10),
-       retry=retry_if_exception_type(Exception))
+
 def process_url(payload):
     url = payload["url"]
     logger.info("Processing %s", url)
@@ -51,22 +78,164 @@ def process_url(payload):
     spider.run()
     SCRAPES_SUCCEEDED.inc()
 
+
 def move_to_dlq(payload, reason):
     payload["_error"] = str(reason)
-    producer.send(DLQ_TOPIC, payload)
-    producer.flush()
+    publish(DLQ_TOPIC, payload)
+
+
+def schedule_retry(payload, reason) -> bool:
+    """Re-publish a failed payload to the retry topic; False once attempts are used up."""
+    attempts = payload.get("_attempts", 0) + 1
+    if attempts >= WORKER_MAX_ATTEMPTS:
+        return False
+    delay = min(WORKER_RETRY_BACKOFF * 2 ** (attempts - 1), WORKER_RETRY_BACKOFF_MAX)
+    payload["_attempts"] = attempts
+    payload["_retry_at"] = time.time() + delay
+    payload["_error"] = str(reason)
+    publish(RETRY_TOPIC, payload)
+    SCRAPES_RETRIED.inc()
+    return True
+
+
+def handle_message(payload: Dict[str, Any]) -> str:
+    """Crawl one URL payload; returns "ok", "retry" or "dlq"."""
+    SCRAPES_IN_FLIGHT.inc()
+    try:
+        process_url(payload)
+        return "ok"
+    except Exception as e:
+        SCRAPES_FAILED.inc()
+        logger.exception("Failed to process %s", payload.get("url"))
+        if schedule_retry(payload, e):
+            return "retry"
+        move_to_dlq(payload, e)
+        return "dlq"
+    finally:
+        SCRAPES_IN_FLIGHT.dec()
+
+
+def _decode(msg) -> Optional[Dict[str, Any]]:
+    try:
+        payload = json.loads(msg.value())
+    except (TypeError, ValueError):
+        logger.warning("Skipping undecodable message at %s[%d]@%d", msg.topic(), msg.partition(), msg.offset())
+        return None
+    return payload if isinstance(payload, dict) and payload.get("url") else None
+
+
+def _commit(consumer, tracker: OffsetTracker, asynchronous: bool = True) -> None:
+    offsets = [TopicPartition(t, p, o) for t, p, o in tracker.committable()]
+    if not offsets:
+        return
+    # a finished message may have re-published itself to the retry/DLQ topic;
+    # its offset is only committed once that copy is delivered
+    if kafka_producer.flush():
+        logger.warning("Retry/DLQ messages undelivered; leaving %d partitions uncommitted", len(offsets))
+        return
+    try:
+        consumer.commit(offsets=offsets, asynchronous=asynchronous)
+    except KafkaException as exc:
+        logger.warning("Offset commit failed: %s", exc)
+
+
+def run_worker(concurrency: int = WORKER_CONCURRENCY, group_id: str = CONSUMER_GROUP) -> None:
+    consumer = Consumer({
+        "bootstrap.servers": KAFKA_BOOTSTRAP,
+        "group.id": group_id,
+        "auto.offset.reset": "earliest",
+        "enable.auto.commit": False,
+    })
+    tracker = OffsetTracker()
+    delayed: Dict[TP, float] = {}  # retry partitions paused until a message is due
+    paused = False  # whole assignment paused while every slot is busy
+
+    def on_assign(c, partitions):
+        # partitions handed over mid-rebalance must follow the current pause state
+        c.assign(partitions)
+        held = [tp for tp in partitions if paused or (tp.topic, tp.partition) in delayed]
+        if held:
+            c.pause(held)
+
+    def on_revoke(c, partitions):
+        _commit(c, tracker, asynchronous=False)
+        tracker.forget((tp.topic, tp.partition) for tp in partitions)
+        for tp in partitions:
+            delayed.pop((tp.topic, tp.partition), None)
+
+    consumer.subscribe([TOPIC, RETRY_TOPIC], on_assign=on_assign, on_revoke=on_revoke)
+    signal.signal(signal.SIGINT, _signal_handler)
+    signal.signal(signal.SIGTERM, _signal_handler)
+    logger.info("Worker started, listening to %s and %s (concurrency=%d)", TOPIC, RETRY_TOPIC, concurrency)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scrape")
+    inflight = set()
+    last_commit = time.time()
+    try:
+        while running:
+            if inflight:
+                _, inflight = wait(inflight, timeout=0, return_when=FIRST_COMPLETED)
+
+            now = time.time()
+            due = [tp for tp, at in delayed.items() if at <= now]
+            for tp in due:
+                del delayed[tp]
+            if due and not paused:
+                consumer.resume([TopicPartition(*tp) for tp in due])
+
+            saturated = len(inflight) >= concurrency
+            if saturated != paused:
+                assignment = consumer.assignment()
+                if saturated:
+                    consumer.pause(assignment)
+                else:
+                    consumer.resume([tp for tp in assignment if (tp.topic, tp.partition) not in delayed])
+                paused = saturated
+
+            free = concurrency - len(inflight)
+            msgs = consumer.consume(num_messages=max(free, 1), timeout=0.2 if paused else 1.0)
+            for msg in msgs:
+                if msg.error():
+                    logger.warning("Kafka message error: %s", msg.error())
+                    continue
+                tp = (msg.topic(), msg.partition())
+                if tp in delayed:
+                    continue  # rewound below; re-delivered once due
+                payload = _decode(msg)
+                retry_at = payload.get("_retry_at", 0) if payload else 0
+                if retry_at > time.time():
+                    delayed[tp] = retry_at
+                    consumer.pause([TopicPartition(*tp)])
+                    consumer.seek(TopicPartition(msg.topic(), msg.partition(), msg.offset()))
+                    continue
+                tracker.track(*tp, msg.offset())
+                if payload is None:
+                    tracker.done(*tp, msg.offset())
+                    continue
+                fut = executor.submit(handle_message, payload)
+                fut.add_done_callback(lambda f, m=msg: tracker.done(m.topic(), m.partition(), m.offset()))
+                inflight.add(fut)
+
+            kafka_producer.get_producer().poll(0)
+            if time.time() - last_commit >= WORKER_COMMIT_INTERVAL:
+                _commit(consumer, tracker)
+                last_commit = time.time()
+
+        # drain: let running crawls finish and commit what they completed
+        wait(inflight)
+        _commit(consumer, tracker, asynchronous=False)
+    finally:
+        executor.shutdown(wait=True)
+        consumer.close()
+
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="URLs crawled at once")
+    parser.add_argument("--group", default=CONSUMER_GROUP)
+    args = parser.parse_args()
+
     start_http_server(8001)  # Prometheus metrics endpoint for this worker
-    logger.info("Worker started, listening to %s", TOPIC)
-    for msg in consumer:
-        payload = msg.value
-        try:
-            process_url(payload)
-            consumer.commit()  # commit offset only on success
-        except Exception as e:
-            SCRAPES_FAILED.inc()
-            logger.exception("Failed to process %s", payload)
-            # after retries, tenacity will re-raise; then move to DLQ
-            move_to_dlq(payload, e)
-            consumer.commit()
+    run_worker(concurrency=args.concurrency, group_id=args.group)
@@ -1,22 +1,101 @@
 # src/scraper/kafka_producer.py
-from kafka import KafkaProducer
-import json
+"""Enqueue URLs for the scraper workers.
+
+Sends are asynchronous: `produce` only appends to librdkafka's local queue
+and the client batches, compresses and ships messages in the background
+(see `create_producer`). Delivery failures are reported through a callback
+served by `poll`, and `flush` is called once when the caller is done (or
+at exit), never per message.
+"""
+import atexit
+import logging
 import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+from confluent_kafka import KafkaError, Producer
+
+from src.infra.kafka.client import create_producer
+
+logger = logging.getLogger(__name__)
 
-KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "localhost:9092")
 TOPIC = os.getenv("KAFKA_URL_TOPIC", "scrape-urls")
+KAFKA_FLUSH_TIMEOUT = float(os.getenv("KAFKA_FLUSH_TIMEOUT", "30"))
+
+# serve delivery callbacks every this many messages while bulk enqueueing
+_POLL_EVERY = 1000
+
+_producer: Optional[Producer] = None
+_lock = threading.Lock()
+_failed = 0
+
+
+def _on_delivery(err: Optional[KafkaError], msg) -> None:
+    global _failed
+    if err is not None:
+        _failed += 1
+        logger.error("Delivery to %s failed: %s", msg.topic(), err)
+
+
+def get_producer() -> Producer:
+    global _producer
+    if _producer is None:
+        with _lock:
+            if _producer is None:
+                # only failures trigger the callback, which keeps it off the hot path
+                _producer = create_producer(on_delivery=_on_delivery, **{"delivery.report.only.error": True})
+                atexit.register(flush)
+    return _producer
+
+
+def publish(topic: str, payload: Dict[str, Any], key: Optional[bytes] = None) -> None:
+    """Queue one JSON message; blocks only while the local queue is full."""
+    producer = get_producer()
+    value = orjson.dumps(payload)
+    while True:
+        try:
+            producer.produce(topic, value, key)
+            return
+        except BufferError:
+            # local queue full: wait for in-flight batches to be acknowledged
+            producer.poll(0.1)
+
+
+def enqueue_url(url: str, meta: Optional[Dict[str, Any]] = None) -> None:
+    publish(TOPIC, {"url": url, "meta": meta or {}})
+    get_producer().poll(0)
+
+
+def enqueue_urls(urls: Iterable[str], meta: Optional[Dict[str, Any]] = None, topic: str = TOPIC) -> int:
+    """Queue every URL from `urls` (any iterable, consumed lazily); returns the count queued."""
+    producer = get_producer()
+    meta = meta or {}
+    count = 0
+    for url in urls:
+        publish(topic, {"url": url, "meta": meta})
+        count += 1
+        if count % _POLL_EVERY == 0:
+            producer.poll(0)
+    producer.poll(0)
+    return count
+
+
+def flush(timeout: float = KAFKA_FLUSH_TIMEOUT) -> int:
+    """Wait for queued messages to be delivered; returns how many are still undelivered."""
+    if _producer is None:
+        return 0
+    remaining = _producer.flush(timeout)
+    if remaining:
+        logger.warning("%d messages still undelivered after %.0fs", remaining, timeout)
+    return remaining
+
 
-producer = KafkaProducer(
-    bootstrap_servers=KAFKA_BOOTSTRAP,
-    value_serializer=lambda v: json.dumps(v).encode("utf-8")
-)
+def failed_count() -> int:
+    return _failed
 
-def enqueue_url(url, meta=None):
-    payload = {"url": url, "meta": meta or {}}
-    producer.send(TOPIC, payload)
-    producer.flush()
 
 if __name__ == "__main__":
     # example
-    enqueue_url("https://quotes.toscrape.com/")
-    enqueue_url("https://books.toscrape.com/")
+    enqueue_urls(["https://quotes.toscrape.com/", "https://books.toscrape.com/"])
+    flush()
@@ -0,0 +1,106 @@
+# src/scraper/seed_loader.py
+"""Stream seed URLs from files or sitemaps into the URL topic.
+
+    python -m src.scraper.seed_loader urls.txt more.txt.gz
+    python -m src.scraper.seed_loader --sitemap https://books.toscrape.com/sitemap.xml
+
+URL files hold one URL per line (blank lines and ``#`` comments skipped).
+Sitemaps may be local paths or URLs, gzipped or not, and sitemap indexes
+are followed recursively. Everything is read incrementally and handed to
+`enqueue_urls`, so memory stays flat however large the seed list is.
+"""
+import argparse
+import gzip
+import io
+import logging
+import sys
+import time
+from typing import IO, Iterable, Iterator, Optional
+
+import requests
+from lxml import etree
+
+from src.scraper import kafka_producer
+
+logger = logging.getLogger(__name__)
+
+_LOC = "{http://www.sitemaps.org/schemas/sitemap/0.9}loc"
+
+
+def _open(source: str) -> IO[bytes]:
+    if source == "-":
+        fh: IO[bytes] = sys.stdin.buffer
+    elif source.startswith(("http://", "https://")):
+        resp = requests.get(source, timeout=30)
+        resp.raise_for_status()
+        fh = io.BytesIO(resp.content)
+    else:
+        fh = open(source, "rb")
+    if source.endswith(".gz"):
+        return gzip.GzipFile(fileobj=fh)
+    return fh
+
+
+def iter_url_file(source: str) -> Iterator[str]:
+    with _open(source) as fh:
+        for line in fh:
+            url = line.strip().decode("utf-8", "replace")
+            if url and not url.startswith("#"):
+                yield url
+
+
+def iter_sitemap(source: str, _seen: Optional[set] = None) -> Iterator[str]:
+    """Yield page URLs from a sitemap, descending into nested sitemap indexes."""
+    seen = _seen if _seen is not None else set()
+    if source in seen:
+        return
+    seen.add(source)
+    nested = []
+    with _open(source) as fh:
+        for _, elem in etree.iterparse(fh, events=("end",), tag=_LOC):
+            loc = (elem.text or "").strip()
+            if loc:
+                if elem.getparent().tag.endswith("sitemap"):
+                    nested.append(loc)
+                else:
+                    yield loc
+            # drop parsed siblings so the tree never holds the whole sitemap
+            parent = elem.getparent()
+            parent.clear()
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                while parent.getprevious() is not None:
+                    del grandparent[0]
+    for child in nested:
+        yield from iter_sitemap(child, seen)
+
+
+def iter_seeds(files: Iterable[str] = (), sitemaps: Iterable[str] = ()) -> Iterator[str]:
+    for source in files:
+        yield from iter_url_file(source)
+    for source in sitemaps:
+        yield from iter_sitemap(source)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stream seed URLs into the scraper topic")
+    parser.add_argument("files", nargs="*", help="URL files, one URL per line ('-' for stdin, .gz ok)")
+    parser.add_argument("--sitemap", action="append", default=[], help="sitemap path or URL (repeatable)")
+    parser.add_argument("--topic", default=kafka_producer.TOPIC)
+    args = parser.parse_args(argv)
+    if not args.files and not args.sitemap:
+        parser.error("give at least one URL file or --sitemap")
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    count = kafka_producer.enqueue_urls(iter_seeds(args.files, args.sitemap), topic=args.topic)
+    remaining = kafka_producer.flush()
+    elapsed = time.perf_counter() - started
+    failed = kafka_producer.failed_count()
+    logger.info("Queued %d urls in %.1fs (%.0f/s); %d failed, %d undelivered",
+                count, elapsed, count / elapsed if elapsed else 0.0, failed, remaining)
+    return 1 if failed or remaining else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
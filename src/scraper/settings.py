@@ -6,6 +6,8 @@ NEWSPIDER_MODULE = "src.scraper.spiders"
 ROBOTSTXT_OBEY = True
 DOWNLOAD_TIMEOUT = 20
 CONCURRENT_REQUESTS = 16
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
+DOWNLOAD_DELAY = 0
 RETRY_TIMES = 2
 DEFAULT_REQUEST_HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -1,11 +1,14 @@
 # src/scraper/spiders/books_spider.py
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from dataclasses import dataclass
 from datetime import datetime
 import os
 
+from src.scraper.image_downloader import get_image_downloader
+from src.scraper.spiders.pagination import iter_pages, run_pipelined
+from src.scraper.spiders.parsers import get_parser
+
 @dataclass
 class BookImageItem:
     title: str
@@ -16,50 +19,64 @@ class BookImageItem:
     scraped_at: str = datetime.utcnow().isoformat()
 
 class BooksSpider:
-    def __init__(self, start_url="https://books.toscrape.com/"):
+    def __init__(self, start_url="https://books.toscrape.com/", parser=None, download_images=True):
         self.start_url = start_url
+        self.parser = get_parser(parser)
         self.session = requests.Session()
         self.out_dir = "data/book_images"
         os.makedirs(self.out_dir, exist_ok=True)
+        # shared with every other BooksSpider in this process writing to out_dir
+        self.images = get_image_downloader(self.out_dir) if download_images else None
 
     def fetch(self, url):
         r = self.session.get(url, timeout=15)
         r.raise_for_status()
         return r.text
 
+    def load(self, url):
+        """Fetch and parse `url` once; see `QuotesSpider.load`."""
+        return self.parser.parse(self.fetch(url))
+
     def parse_page(self, html, page_url):
-        soup = BeautifulSoup(html, "lxml")
-        for article in soup.select("article.product_pod"):
-            title = article.h3.a['title']
-            price = article.select_one(".price_color").get_text(strip=True)
-            img_rel = article.select_one("img")['src']
+        return self.extract_items(self.parser.parse(html), page_url)
+
+    def extract_items(self, doc, page_url):
+        p = self.parser
+        for article in p.select(doc, "article.product_pod"):
+            title = p.attr(p.select_one(article, "h3 a"), "title")
+            price = p.text(p.select_one(article, ".price_color"))
+            img_rel = p.attr(p.select_one(article, "img"), "src")
             image_url = urljoin(page_url, img_rel)
-            # download
+            # download in the background; parsing does not wait for the bytes
             local_filename = os.path.join(self.out_dir, image_url.split("/")[-1].split("?")[0])
-            self.download_image(image_url, local_filename)
+            if self.images is not None:
+                self.images.submit(image_url, local_filename)
             yield BookImageItem(title=title, price=price, image_url=image_url, local_path=local_filename, page_url=page_url)
 
     def download_image(self, url, path):
-        if os.path.exists(path):
-            return
-        r = self.session.get(url, stream=True, timeout=20)
-        r.raise_for_status()
-        with open(path, "wb") as f:
-            for chunk in r.iter_content(1024*8):
-                f.write(chunk)
+        return self.images.submit(url, path).result()
 
-    def next_page(self, soup, page_url):
-        next_a = soup.select_one("li.next a")
-        if next_a:
-            return urljoin(page_url, next_a['href'])
+    def next_page(self, doc, page_url):
+        next_a = self.parser.select_one(doc, "li.next a")
+        if next_a is not None:
+            return urljoin(page_url, self.parser.attr(next_a, "href"))
         return None
 
-    def run(self):
-        url = self.start_url
-        while url:
-            html = self.fetch(url)
-            soup = BeautifulSoup(html, "lxml")
-            for item in self.parse_page(html, url):
-                from src.processing.processor import process_book_image_item
-                process_book_image_item(item)
-            url = self.next_page(soup, url)
+    def process_page(self, page_url, doc):
+        from src.processing.processor import process_book_image_items
+        process_book_image_items(list(self.extract_items(doc, page_url)))
+
+    def run(self, pipelined=True):
+        """Crawl every catalogue page; see `QuotesSpider.run` for the pipelined mode."""
+        try:
+            if pipelined:
+                run_pipelined(iter_pages(self.load, self.start_url, self.next_page), self.process_page)
+                return
+            url = self.start_url
+            while url:
+                doc = self.load(url)
+                self.process_page(url, doc)
+                url = self.next_page(doc, url)
+        finally:
+            if self.images is not None:
+                self.images.wait()
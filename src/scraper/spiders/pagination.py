@@ -0,0 +1,139 @@
+"""Pipelined pagination shared by the quotes and books spiders.
+
+`iter_pages` walks a paginated listing by following "next" links, but once a
+next link matches a numbered pattern (``/page/{n}/`` on quotes.toscrape.com,
+``page-{n}.html`` on books.toscrape.com) it fetches the following pages
+speculatively, `window` at a time, on a thread pool. Pages are still yielded
+in order and the walk still stops at the first page without a next link (or
+at a 404), so speculation only changes how early pages are fetched.
+
+`run_pipelined` runs such an iterator on a producer thread feeding a bounded
+queue, so fetching page N+1 overlaps with extracting and storing page N.
+
+`fetch` may return raw HTML or an already-parsed document; whatever it returns
+is what `find_next` and the page handler receive, so a spider can parse each
+page exactly once (on the fetching thread).
+"""
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+import requests
+
+_PAGE_PATTERNS = (
+    re.compile(r"^(?P<prefix>.*/page/)(?P<n>\d+)(?P<suffix>/?)$"),
+    re.compile(r"^(?P<prefix>.*page-)(?P<n>\d+)(?P<suffix>\.html)$"),
+)
+
+SPIDER_PAGE_QUEUE = int(os.getenv("SPIDER_PAGE_QUEUE", "4"))
+SPIDER_SPECULATIVE_PAGES = int(os.getenv("SPIDER_SPECULATIVE_PAGES", "4"))
+
+Page = Tuple[str, Any]
+
+
+def page_template(url: str) -> Optional[Tuple[str, int]]:
+    """Return ("...{}...", n) if `url` is page n of a numbered listing."""
+    for pattern in _PAGE_PATTERNS:
+        m = pattern.match(url)
+        if m:
+            return m.group("prefix") + "{}" + m.group("suffix"), int(m.group("n"))
+    return None
+
+
+def _fetch_or_none(fetch: Callable[[str], Any], url: str) -> Optional[Any]:
+    try:
+        return fetch(url)
+    except requests.HTTPError as exc:
+        if exc.response is not None and exc.response.status_code == 404:
+            return None
+        raise
+
+
+def iter_pages(
+    fetch: Callable[[str], Any],
+    start_url: str,
+    find_next: Callable[[Any, str], Optional[str]],
+    window: int = SPIDER_SPECULATIVE_PAGES,
+) -> Iterator[Page]:
+    """Yield (url, page) for `start_url` and every page reachable via next links."""
+    url, page = start_url, fetch(start_url)
+    while True:
+        yield url, page
+        nxt = find_next(page, url)
+        if nxt is None:
+            return
+        tpl = page_template(nxt) if window > 1 else None
+        if tpl is None:
+            url, page = nxt, fetch(nxt)
+            continue
+
+        template, n = tpl
+        with ThreadPoolExecutor(max_workers=window) as pool:
+            pending = deque()
+            for k in range(n, n + window):
+                pending.append((template.format(k), pool.submit(_fetch_or_none, fetch, template.format(k))))
+            k = n + window
+            try:
+                while pending:
+                    url, future = pending.popleft()
+                    page = future.result()
+                    if page is None:
+                        return
+                    yield url, page
+                    if find_next(page, url) is None:
+                        return
+                    pending.append((template.format(k), pool.submit(_fetch_or_none, fetch, template.format(k))))
+                    k += 1
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+
+_DONE = object()
+
+
+def run_pipelined(pages: Iterator[Page], handle: Callable[[str, Any], None], maxsize: int = SPIDER_PAGE_QUEUE) -> None:
+    """Call `handle(url, page)` for each page while a producer thread keeps
+    fetching ahead, at most `maxsize` pages in the queue."""
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except BaseException as exc:
+            put(exc)
+        finally:
+            put(_DONE)
+
+    producer = threading.Thread(target=produce, name="page-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            handle(*item)
+    finally:
+        stop.set()
+        producer.join()
+
+
+__all__ = ["iter_pages", "page_template", "run_pipelined"]
@@ -0,0 +1,144 @@
+"""Pluggable HTML parser backends for the spiders.
+
+Each backend parses a page once into a document and answers CSS queries on
+it, so a spider can extract items and find the next link from the same tree:
+
+* ``selectolax`` -- lexbor-based C parser, fastest;
+* ``lxml``       -- ``lxml.html`` with selectors compiled once via cssselect;
+* ``bs4``        -- BeautifulSoup over lxml, the original behaviour.
+
+`SPIDER_PARSER` picks the backend; ``auto`` (the default) takes the first one
+whose dependencies are installed, in the order above.
+"""
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Type
+
+SPIDER_PARSER = os.getenv("SPIDER_PARSER", "auto")
+
+
+class ParserBackend:
+    name = ""
+
+    def parse(self, html: str) -> Any:
+        raise NotImplementedError
+
+    def select(self, node: Any, css: str) -> List[Any]:
+        raise NotImplementedError
+
+    def select_one(self, node: Any, css: str) -> Optional[Any]:
+        found = self.select(node, css)
+        return found[0] if found else None
+
+    def text(self, node: Any) -> str:
+        raise NotImplementedError
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class Bs4Backend(ParserBackend):
+    name = "bs4"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+
+        self._soup = BeautifulSoup
+
+    def parse(self, html):
+        return self._soup(html, "lxml")
+
+    def select(self, node, css):
+        return node.select(css)
+
+    def select_one(self, node, css):
+        return node.select_one(css)
+
+    def text(self, node):
+        return node.get_text(strip=True)
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class LxmlBackend(ParserBackend):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+
+        self._fromstring = lxml.html.document_fromstring
+        self._compile = lru_cache(maxsize=256)(CSSSelector)
+
+    def parse(self, html):
+        return self._fromstring(html)
+
+    def select(self, node, css):
+        return self._compile(css)(node)
+
+    def text(self, node):
+        return node.text_content().strip()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+
+class SelectolaxBackend(ParserBackend):
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser = LexborHTMLParser
+
+    def parse(self, html):
+        return self._parser(html)
+
+    def select(self, node, css):
+        return node.css(css)
+
+    def select_one(self, node, css):
+        return node.css_first(css)
+
+    def text(self, node):
+        return node.text(strip=True)
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+
+BACKENDS: Dict[str, Type[ParserBackend]] = {
+    "selectolax": SelectolaxBackend,
+    "lxml": LxmlBackend,
+    "bs4": Bs4Backend,
+}
+
+
+def available_backends() -> List[str]:
+    names = []
+    for name, cls in BACKENDS.items():
+        try:
+            cls()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_parser(name: Optional[str] = None) -> ParserBackend:
+    """Return a backend by name; ``auto`` picks the fastest installed one."""
+    name = name or SPIDER_PARSER
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown parser backend {name!r}; choose from {sorted(BACKENDS)}")
+        return BACKENDS[name]()
+    for cls in BACKENDS.values():
+        try:
+            return cls()
+        except ImportError:
+            continue
+    raise ImportError("No HTML parser backend is installed")
+
+
+__all__ = ["ParserBackend", "BACKENDS", "available_backends", "get_parser"]
@@ -62,10 +62,12 @@
         
 # src/scraper/spiders/quotes_spider.py
 import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 from dataclasses import dataclass
-from typing import Iterator, Dict
+from typing import Any, Iterator, Dict
+
+from src.scraper.spiders.pagination import iter_pages, run_pipelined
+from src.scraper.spiders.parsers import get_parser
 
 @dataclass
 class QuoteItem:
@@ -76,35 +78,54 @@ class QuoteItem:
     scraped_at: str = datetime.utcnow().isoformat()
 
 class QuotesSpider:
-    def __init__(self, start_url="https://quotes.toscrape.com/"):
+    def __init__(self, start_url="https://quotes.toscrape.com/", parser=None):
         self.start_url = start_url
+        self.session = requests.Session()
+        self.parser = get_parser(parser)
 
     def fetch(self, url: str) -> str:
-        res = requests.get(url, timeout=15)
+        res = self.session.get(url, timeout=15)
         res.raise_for_status()
         return res.text
 
+    def load(self, url: str) -> Any:
+        """Fetch and parse `url` once; the document feeds both
+        `extract_items` and `next_page`."""
+        return self.parser.parse(self.fetch(url))
+
     def parse_page(self, html: str, page_url: str) -> Iterator[QuoteItem]:
-        soup = BeautifulSoup(html, "lxml")
-        for q in soup.select(".quote"):
-            text = q.select_one(".text").get_text(strip=True)
-            author = q.select_one(".author").get_text(strip=True)
-            tags = [t.get_text(strip=True) for t in q.select(".tags .tag")]
+        return self.extract_items(self.parser.parse(html), page_url)
+
+    def extract_items(self, doc: Any, page_url: str) -> Iterator[QuoteItem]:
+        p = self.parser
+        for q in p.select(doc, ".quote"):
+            text = p.text(p.select_one(q, ".text"))
+            author = p.text(p.select_one(q, ".author"))
+            tags = [p.text(t) for t in p.select(q, ".tags .tag")]
             yield QuoteItem(text=text, author=author, tags=tags, url=page_url)
 
-    def next_page(self, soup: BeautifulSoup) -> str | None:
-        next_a = soup.select_one("li.next a")
-        if next_a:
-            return requests.compat.urljoin(self.start_url, next_a['href'])
+    def next_page(self, doc: Any, page_url: str | None = None) -> str | None:
+        next_a = self.parser.select_one(doc, "li.next a")
+        if next_a is not None:
+            return requests.compat.urljoin(page_url or self.start_url, self.parser.attr(next_a, "href"))
         return None
 
-    def run(self):
+    def process_page(self, page_url: str, doc: Any):
+        # send to processor / mongodb / vector upsert
+        from src.processing.processor import process_quote_items
+        process_quote_items(list(self.extract_items(doc, page_url)))
+
+    def run(self, pipelined: bool = True):
+        """Crawl every page from `start_url`.
+
+        In pipelined mode pages are fetched ahead (speculatively for numbered
+        `/page/{n}/` urls) on a producer thread while this thread processes them.
+        """
+        if pipelined:
+            run_pipelined(iter_pages(self.load, self.start_url, self.next_page), self.process_page)
+            return
         url = self.start_url
         while url:
-            html = self.fetch(url)
-            soup = BeautifulSoup(html, "lxml")
-            for item in self.parse_page(html, url):
-                # send to processor / mongodb / vector upsert
-                from src.processing.processor import process_quote_item
-                process_quote_item(item)
-            url = self.next_page(soup)
+            doc = self.load(url)
+            self.process_page(url, doc)
+            url = self.next_page(doc, url)
@@ -110,6 +110,74 @@ def test_embeddings():
         return False
 
 
+def test_embed_texts_batches_match_single():
+    """Batched embeddings agree row-for-row with single-text embeddings."""
+    import numpy as np
+    from src.rag.embeddings import embed_text, embed_texts
+
+    texts = ["first chunk", "second chunk", ""]
+    batched = embed_texts(texts, batch_size=2)
+    assert batched.shape[0] == 3
+    for row, text in zip(batched, texts):
+        single = np.asarray(embed_text(text), dtype="float32")
+        assert np.allclose(row[: len(single)], single)
+
+
+def test_embedding_cache_skips_repeat_calls(tmp_path, monkeypatch):
+    """Texts seen before (modulo whitespace) are served from the cache, across instances."""
+    from src.rag import embeddings, embedding_cache
+
+    calls = []
+
+    class FakeGemini:
+        @staticmethod
+        def embed_content(model, content):
+            batch = content if isinstance(content, list) else [content]
+            calls.append(len(batch))
+            vectors = [[float(len(t)), 1.0, 2.0] for t in batch]
+            return {"embedding": vectors if isinstance(content, list) else vectors[0]}
+
+    path = str(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(embeddings, "_HAS_GEMINI", True)
+    monkeypatch.setattr(embeddings, "gemini", FakeGemini, raising=False)
+    monkeypatch.setattr(embedding_cache, "_cache", embedding_cache.EmbeddingCache(path))
+
+    first = embeddings.embed_texts(["a quote", "another quote", "a quote"])
+    assert calls == [2]
+    assert embeddings.embed_text("a  quote ") == first[0].tolist()
+    assert calls == [2]
+
+    # a fresh process-level cache still hits the shared SQLite tier
+    monkeypatch.setattr(embedding_cache, "_cache", embedding_cache.EmbeddingCache(path))
+    embeddings.embed_texts(["another quote"])
+    assert calls == [2]
+    assert embedding_cache.get_embedding_cache().stats()["disk_hits"] == 1
+
+
+def test_embedding_cache_counts_each_lookup(tmp_path):
+    """A key repeated in one call counts as a hit or a miss once per occurrence."""
+    import numpy as np
+    from src.rag import embedding_cache
+
+    def counts():
+        return (
+            embedding_cache.CACHE_HITS.labels(tier="memory")._value.get(),
+            embedding_cache.CACHE_HITS.labels(tier="disk")._value.get(),
+            embedding_cache.CACHE_MISSES._value.get(),
+        )
+
+    path = str(tmp_path / "cache.sqlite3")
+    embedding_cache.EmbeddingCache(path).put_many({b"disk": np.ones(2, dtype="float32")})
+    cache = embedding_cache.EmbeddingCache(path)
+
+    before = counts()
+    assert sorted(cache.get_many([b"disk", b"new", b"disk", b"new"])) == [b"disk"]
+    assert cache.get_many([b"disk", b"disk", b"new"]).keys() == {b"disk"}
+    after = counts()
+    assert [a - b for a, b in zip(after, before)] == [2, 2, 3]
+    assert cache.stats()["disk_hits"] == 2 and cache.stats()["misses"] == 3
+
+
 def test_faiss_client():
     """Test 5: FAISS client operations."""
     print("\n" + "="*60)
@@ -154,6 +222,681 @@ def test_faiss_client():
         return False
 
 
+def test_faiss_upsert_many(tmp_path):
+    """Batched upsert assigns ids in order and replaces re-used ids."""
+    import numpy as np
+    from src.infra.vector.faiss_client import FaissClient
+
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    ids = client.upsert_many(np.eye(8, dtype="float32")[:3], [{"text": str(i)} for i in range(3)])
+    assert ids == [1, 2, 3]
+
+    client.upsert_many(np.eye(8, dtype="float32")[[5]], [{"text": "replaced"}], ids=[2])
+    results = client.search(np.eye(8, dtype="float32")[5], top_k=1)
+    assert results[0]["id"] == 2
+    assert results[0]["metadata"]["text"] == "replaced"
+
+
+def test_faiss_metadata_log_replay(tmp_path):
+    """Metadata survives a restart and a torn trailing log record."""
+    from src.infra.vector.faiss_client import FaissClient
+
+    meta = str(tmp_path / "meta.json")
+    client = FaissClient(dim=8, metadata_path=meta)
+    client.upsert_many([[1.0], [2.0]], [{"text": "a"}, {"text": "b"}])
+    client.close()
+    with open(meta + ".log", "a", encoding="utf-8") as fh:
+        fh.write('{"op": "put", "id": 9, "md": {"te')
+
+    reloaded = FaissClient(dim=8, metadata_path=meta)
+    assert reloaded._metastore == {1: {"text": "a"}, 2: {"text": "b"}}
+    assert reloaded.upsert([3.0], {"text": "c"}) == 3
+
+    reloaded._metalog.compact(reloaded._metastore)
+    reloaded.close()
+    assert FaissClient(dim=8, metadata_path=meta)._metastore[3] == {"text": "c"}
+
+
+def test_faiss_index_snapshot_restore(tmp_path):
+    """Vectors written before close() are searchable after a restart."""
+    import numpy as np
+    from src.infra.vector.faiss_client import FaissClient
+
+    kwargs = dict(dim=8, index_path=str(tmp_path / "index.bin"), metadata_path=str(tmp_path / "meta.json"))
+    client = FaissClient(**kwargs)
+    client.upsert_many(np.eye(8, dtype="float32")[:3], [{"text": str(i)} for i in range(3)])
+    client.close()
+
+    restored = FaissClient(**kwargs)
+    results = restored.search(np.eye(8, dtype="float32")[1], top_k=1)
+    assert results[0]["id"] == 2
+    assert results[0]["metadata"] == {"text": "1"}
+    restored.close()
+
+
+def test_faiss_store_allows_one_writer(tmp_path):
+    """A second client on the same store fails instead of clobbering it."""
+    import pytest
+    from src.infra.vector import faiss_client
+
+    if faiss_client.fcntl is None:
+        pytest.skip("no advisory file locks on this platform")
+    kwargs = dict(dim=8, index_path=str(tmp_path / "index.bin"), metadata_path=str(tmp_path / "meta.json"))
+    client = faiss_client.FaissClient(**kwargs)
+    with pytest.raises(RuntimeError, match="already open"):
+        faiss_client.FaissClient(**kwargs)
+    client.close()
+    faiss_client.FaissClient(**kwargs).close()
+
+
+def test_faiss_read_only_client_runs_beside_the_writer(tmp_path):
+    """A read-only client opens a store another client is writing, searches its
+    last snapshot, and never writes to it."""
+    import pytest
+    from src.infra.vector import faiss_client
+    from src.rag.embeddings import embed_text
+
+    kwargs = dict(dim=8, index_path=str(tmp_path / "index.bin"), metadata_path=str(tmp_path / "meta.json"))
+    writer = faiss_client.FaissClient(snapshot_interval=0, **kwargs)
+    writer.upsert(embed_text("stars"), {"text": "stars"}, id=7)
+    writer.snapshot()
+    log_path = writer._metalog.log_path
+    with open(log_path, "a", encoding="utf-8") as fh:
+        fh.write('{"op": "put", "id": 8')  # an append still in progress
+    log_size = os.path.getsize(log_path)
+
+    reader = faiss_client.FaissClient(read_only=True, **kwargs)
+    assert reader.search(embed_text("stars"), top_k=1)[0]["metadata"]["text"] == "stars"
+    with pytest.raises(RuntimeError, match="read-only"):
+        reader.upsert(embed_text("moon"), {"text": "moon"})
+    reader.close()
+    assert os.path.getsize(log_path) == log_size
+    writer.close()
+
+
+def test_numpy_index_growth_and_reuse(tmp_path):
+    """The fallback index grows by doubling and reuses slots freed by deletes."""
+    import numpy as np
+    from src.infra.vector.numpy_index import NumpyIndex
+
+    index = NumpyIndex(4, capacity=2, mmap_path=str(tmp_path / "vectors.f32"))
+    index.add_with_ids(np.eye(4, dtype="float32"), np.arange(1, 5))
+    assert index.ntotal == 4 and index._capacity == 4
+
+    index.remove_ids(np.array([2]))
+    index.add_with_ids(np.eye(4, dtype="float32")[[1]], np.array([7]))
+    assert index._size == 4
+    D, I = index.search(np.eye(4, dtype="float32")[1], 2)
+    assert I[0, 0] == 7
+
+
+def test_faiss_search_many_matches_search(tmp_path):
+    """Batched search returns the same ranking as one-at-a-time search."""
+    import numpy as np
+    from src.infra.vector.faiss_client import FaissClient
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 8)).astype("float32")
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    client.upsert_many(vectors, [{"row": i} for i in range(50)])
+
+    batched = client.search_many(vectors[:4], top_k=5)
+    assert len(batched) == 4
+    for q in range(4):
+        single = client.search(vectors[q], top_k=5)
+        assert [r["id"] for r in batched[q]] == [r["id"] for r in single]
+        scores = [r["score"] for r in single]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_faiss_migrates_flat_to_ivf(tmp_path, monkeypatch):
+    """A trained index spec starts flat and migrates once the corpus is large enough."""
+    import numpy as np
+    import pytest
+    from src.infra.vector import faiss_client
+
+    if not faiss_client._FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    monkeypatch.setenv("FAISS_MIGRATE_THRESHOLD", "500")
+    client = faiss_client.FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"), index_spec="IVF4,Flat")
+    vectors = np.random.default_rng(0).standard_normal((600, 8)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    client.upsert_many(vectors[:400], [{} for _ in range(400)])
+    assert client._is_flat()
+
+    client.upsert_many(vectors[400:], [{} for _ in range(200)])
+    assert not client._is_flat()
+    assert client._index.ntotal == 600
+    assert client.search(vectors[10], top_k=1, nprobe=4)[0]["id"] == 11
+
+
+def test_faiss_reupsert_under_ivf_and_hnsw(tmp_path, monkeypatch):
+    """Replacing an id leaves no stale copy and does not shift other ids."""
+    import numpy as np
+    import pytest
+    from src.infra.vector import faiss_client
+
+    if not faiss_client._FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    monkeypatch.setenv("FAISS_MIGRATE_THRESHOLD", "500")
+    vectors = np.random.default_rng(1).standard_normal((600, 8)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    for spec in ("IVF16,Flat", "HNSW16"):
+        client = faiss_client.FaissClient(dim=8, metadata_path=str(tmp_path / f"{spec}.json"), index_spec=spec)
+        client.upsert_many(vectors, [{"text": str(i + 1)} for i in range(600)])
+        assert client.search(vectors[409], top_k=1, nprobe=16)[0]["id"] == 410
+
+        client.upsert(-vectors[5], {"text": "replaced"}, id=6)
+        hit = client.search(vectors[409], top_k=1, nprobe=16)[0]
+        assert (hit["id"], hit["metadata"]["text"]) == (410, "410")
+        assert 6 not in [r["id"] for r in client.search(vectors[5], top_k=5, nprobe=16)]
+        assert client.search(-vectors[5], top_k=1, nprobe=16)[0]["metadata"]["text"] == "replaced"
+
+        exported = np.concatenate([ids for ids, _, _ in client.iter_vectors(128)])
+        assert sorted(exported.tolist()) == list(range(1, 601))
+
+
+def test_faiss_repeated_reupserts_under_hnsw(tmp_path, monkeypatch):
+    """Superseded HNSW rows never hide the live copy, and the index is rebuilt
+    once they pile up."""
+    import numpy as np
+    import pytest
+    from src.infra.vector import faiss_client
+
+    if not faiss_client._FAISS_AVAILABLE:
+        pytest.skip("faiss not installed")
+    vectors = np.random.default_rng(0).standard_normal((100, 8)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = list(range(1, 101))
+
+    for ratio in ("1.0", "0.25"):
+        monkeypatch.setenv("FAISS_COMPACT_RATIO", ratio)
+        client = faiss_client.FaissClient(dim=8, metadata_path=str(tmp_path / f"{ratio}.json"), index_spec="HNSW16")
+        client.upsert_many(vectors, [{"n": i} for i in ids], ids=ids)
+        for _ in range(20):
+            client.upsert_many(vectors[:10], [{"n": i} for i in ids[:10]], ids=ids[:10])
+
+        assert [client.search(vectors[i], top_k=1)[0]["id"] for i in range(10)] == ids[:10]
+        assert len(client.search(vectors[0], top_k=3)) == 3
+        if ratio == "1.0":
+            assert client._index.ntotal == 300 and client._tombstones == 200
+        else:
+            assert client._index.ntotal < 150 and client._tombstones < 50
+        exported = np.concatenate([batch for batch, _, _ in client.iter_vectors(64)])
+        assert sorted(exported.tolist()) == ids
+        client.close()
+
+
+def test_search_cache_invalidated_by_upsert(tmp_path, monkeypatch):
+    """Repeated queries hit the cache until the index generation changes."""
+    import threading
+    from src.infra.vector.faiss_client import FaissClient
+    from src.rag import search_cache
+    from src.rag.embeddings import embed_text
+
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    client.upsert(embed_text("stars"), {"text": "stars"})
+    scans = []
+    real_search = client.search
+    monkeypatch.setattr(client, "search", lambda *a, **kw: scans.append(1) or real_search(*a, **kw))
+
+    threads = [threading.Thread(target=search_cache.cached_search, args=("night  sky", 3, client)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    search_cache.cached_search("night sky", 3, client)
+    assert len(scans) == 1
+
+    client.upsert(embed_text("moon"), {"text": "moon"})
+    assert len(search_cache.cached_search("night sky", 3, client)) == 2
+    assert len(scans) == 2
+
+
+def test_search_and_stream_emits_results_first(tmp_path, monkeypatch):
+    """The stream yields search results before any summary text."""
+    import asyncio
+    import pytest
+
+    pytest.importorskip("google.generativeai")
+    from src.infra.vector.faiss_client import FaissClient
+    from src.rag import pipeline
+    from src.rag.embeddings import embed_text
+    from src.rag.search_and_summarize import search_and_stream
+
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    client.upsert(embed_text("be yourself"), {"text": "be yourself"})
+    monkeypatch.setattr(pipeline, "_faiss_client", client)
+
+    async def fake_summarizer(chunks):
+        for word in " ".join(chunks).split():
+            yield word
+
+    async def collect():
+        return [e async for e in search_and_stream("yourself", top_k=1, summarizer=fake_summarizer)]
+
+    events = asyncio.run(collect())
+    assert [name for name, _ in events] == ["results", "summary", "summary", "done"]
+    assert events[0][1]["results"][0]["metadata"]["text"] == "be yourself"
+
+
+def test_api_endpoints_with_fake_mongo_and_summarizer(tmp_path, monkeypatch):
+    """The async handlers page through Mongo cursors and search without blocking
+    the search pool on query embedding."""
+    import threading
+    import pytest
+
+    pytest.importorskip("google.generativeai")
+    from bson import ObjectId
+    from fastapi.testclient import TestClient
+    from src.api import main
+    from src.infra.vector.faiss_client import FaissClient
+    from src.rag import pipeline, search_and_summarize, search_cache
+    from src.rag.embeddings import embed_text
+
+    class FakeCursor:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def sort(self, spec):
+            return self
+
+        def skip(self, n):
+            return FakeCursor(self.docs[n:])
+
+        def limit(self, n):
+            return FakeCursor(self.docs[:n])
+
+        def __aiter__(self):
+            return self._iter()
+
+        async def _iter(self):
+            for doc in self.docs:
+                yield dict(doc)
+
+    class FakeCollection:
+        def __init__(self, docs):
+            self.docs = docs
+            self.queries = []
+
+        def find(self, query, projection=None):
+            self.queries.append(query)
+            return FakeCursor(self.docs)
+
+    quotes = FakeCollection([
+        {"_id": ObjectId(), "text": f"q{i}", "author": "a", "scraped_at": f"2024-01-0{9 - i}"} for i in range(3)
+    ])
+    books = FakeCollection([{"_id": ObjectId(), "title": "A Light in the Attic", "scraped_at": "2024-01-01"}])
+    monkeypatch.setattr(main, "mongo", type("FakeDB", (), {"quotes": quotes, "book_images": books})())
+
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    client.upsert(embed_text("be yourself"), {"text": "be yourself"})
+    monkeypatch.setattr(pipeline, "_faiss_client", client)
+    embed_threads = []
+
+    def fake_embed(text):
+        embed_threads.append(threading.current_thread().name)
+        return embed_text(text)
+
+    async def fake_summary(chunks):
+        return "summary of " + " | ".join(chunks)
+
+    monkeypatch.setattr(search_cache, "embed_text", fake_embed)
+    monkeypatch.setattr(search_and_summarize, "summarize_with_gemini_async", fake_summary)
+    api = TestClient(main.app)
+
+    page = api.get("/quotes", params={"limit": 2, "author": "a"}).json()
+    assert [d["text"] for d in page["items"]] == ["q0", "q1"] and page["next_cursor"]
+    assert quotes.queries == [{"author": "a"}]
+    assert api.get("/quotes", params={"cursor": page["next_cursor"]}).status_code == 200
+    assert "$or" in quotes.queries[-1]
+    assert api.get("/quotes", params={"cursor": "bogus"}).status_code == 400
+
+    page = api.get("/books", params={"title": "light"}).json()
+    assert page["count"] == 1 and page["next_cursor"] is None
+    assert books.queries == [{"$text": {"$search": "light"}}]
+
+    found = api.post("/api/search", json={"q": "yourself", "top_k": 1}).json()
+    assert found["results"][0]["metadata"]["text"] == "be yourself"
+    body = api.get("/search/quotes", params={"query": "be", "top_k": 1, "summary_k": 1}).json()
+    assert body["summary"] == "summary of be yourself"
+    assert embed_threads and all(name.startswith("query-embed") for name in embed_threads)
+    client.close()
+
+
+def test_summary_cache_reuses_identical_chunk_sets(monkeypatch):
+    """The LLM is called once per distinct ordered chunk set."""
+    import pytest
+
+    pytest.importorskip("google.generativeai")
+    from src.rag import llm, summary_cache
+
+    prompts = []
+
+    class FakeModel:
+        def generate_content(self, prompt):
+            prompts.append(prompt)
+            return type("Resp", (), {"text": f"summary {len(prompts)}"})()
+
+    monkeypatch.setattr(llm, "model", FakeModel())
+    monkeypatch.setattr(summary_cache, "_cache", summary_cache.SummaryCache())
+
+    assert llm.summarize_with_gemini(["a", "b"]) == "summary 1"
+    assert llm.summarize_with_gemini(["a", "b"]) == "summary 1"
+    assert llm.summarize_with_gemini(["b", "a"]) == "summary 2"
+    assert len(prompts) == 2
+
+
+def test_bulk_upsert_writer_batches_and_returns_ids():
+    """Docs go out as one unordered bulk_write per batch, deduplicated by key,
+    with upserted ids taken from the bulk result."""
+    from src.infra.mongo.bulk_writer import BulkUpsertWriter
+
+    class FakeCollection:
+        name = "quotes"
+
+        def __init__(self):
+            self.calls = []
+            self.rows = {}
+
+        def bulk_write(self, ops, ordered=True):
+            self.calls.append((len(ops), ordered))
+            upserted = {}
+            for i, op in enumerate(ops):
+                key = tuple(sorted(op._filter.items()))
+                if key not in self.rows:
+                    upserted[i] = f"id{len(self.rows)}"
+                self.rows[key] = op._doc["$set"]
+            return type("Result", (), {"upserted_ids": upserted})()
+
+    coll = FakeCollection()
+    writer = BulkUpsertWriter(coll, key_fields=("url", "text"), batch_size=3, flush_interval=0)
+    docs = [{"url": "u", "text": t, "author": "a"} for t in ("x", "y")]
+    assert writer.write(docs) == ["id0", "id1"]
+    assert writer.write(docs[:1] + [{"url": "u", "text": "z"}]) == [None, "id2"]
+
+    writer.add({"url": "u", "text": "w"})
+    writer.add({"url": "u", "text": "w", "author": "b"})
+    assert coll.calls == [(2, False), (2, False)]
+    writer.add({"url": "u", "text": "v"})
+    writer.add({"url": "u", "text": "q"})  # third distinct key fills the batch
+    assert coll.calls[-1] == (3, False)
+    assert coll.rows[(("text", "w"), ("url", "u"))]["author"] == "b"
+    writer.close()
+
+
+def test_bulk_upsert_writer_concurrent_writes_keep_their_ids():
+    """Each write() gets the ids of its own new rows, whatever other threads do."""
+    import threading
+    import time
+    from src.infra.mongo.bulk_writer import BulkUpsertWriter
+
+    class FakeCollection:
+        name = "quotes"
+
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.rows = set()
+
+        def bulk_write(self, ops, ordered=True):
+            time.sleep(0.01)  # a round-trip, during which other writers queue up
+            with self.lock:
+                upserted = {}
+                for i, op in enumerate(ops):
+                    key = tuple(sorted(op._filter.items()))
+                    if key not in self.rows:
+                        self.rows.add(key)
+                        upserted[i] = f"id-{key}"
+            return type("Result", (), {"upserted_ids": upserted})()
+
+    writer = BulkUpsertWriter(FakeCollection(), key_fields=("url", "text"), flush_interval=0)
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def run(n):
+        docs = [{"url": f"u{n}", "text": str(i)} for i in range(3)]
+        barrier.wait()
+        results[n] = writer.write(docs)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(None not in ids for ids in results.values())
+    writer.close()
+
+
+def test_ensure_indexes_covers_listing_queries():
+    """Listing filters/sorts and upsert keys have indexes; failures are logged."""
+    from src.infra.mongo.indexes import INDEXES, ensure_indexes
+
+    keys = {name: [list(m.document["key"].items()) for m in models] for name, models in INDEXES.items()}
+    assert [("author", 1), ("scraped_at", -1), ("_id", -1)] in keys["quotes"]
+    assert [("tags", 1), ("scraped_at", -1), ("_id", -1)] in keys["quotes"]
+    assert [("title", "text")] in keys["book_images"]
+    assert any(m.document.get("unique") and list(m.document["key"]) == ["url", "text"] for m in INDEXES["quotes"])
+
+    created = {}
+
+    class FakeCollection:
+        def __init__(self, name):
+            self.name = name
+
+        def create_indexes(self, models):
+            if self.name == "book_images":
+                raise RuntimeError("server unavailable")
+            created[self.name] = len(models)
+
+    ensure_indexes({name: FakeCollection(name) for name in INDEXES})
+    assert created == {"quotes": len(INDEXES["quotes"])}
+
+
+def test_keyset_cursor_round_trip():
+    """next_cursor encodes (scraped_at, _id) of the last item and decodes to a
+    strict range query; garbage cursors are rejected with 400."""
+    import pytest
+    from bson import ObjectId
+    from fastapi import HTTPException
+    from src.api.pagination import apply_cursor, next_cursor
+
+    oid = ObjectId()
+    docs = [{"_id": ObjectId(), "scraped_at": "2024-01-02"}, {"_id": oid, "scraped_at": "2024-01-01"}]
+    assert next_cursor(docs, limit=3) is None
+    token = next_cursor(docs, limit=2)
+    assert "=" not in token and "2024" not in token
+
+    q = apply_cursor({"author": "a"}, token)
+    assert q == {"$and": [{"author": "a"}, {"$or": [
+        {"scraped_at": {"$lt": "2024-01-01"}},
+        {"scraped_at": "2024-01-01", "_id": {"$lt": oid}},
+    ]}]}
+    assert apply_cursor({}, None) == {}
+    with pytest.raises(HTTPException) as exc:
+        apply_cursor({}, "not-a-cursor")
+    assert exc.value.status_code == 400
+
+
+def test_export_vectors_streams_ndjson(tmp_path, monkeypatch):
+    """/export/vectors streams every stored vector as one NDJSON line."""
+    import numpy as np
+    import orjson
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.api import export
+    from src.infra.vector.faiss_client import FaissClient
+
+    client = FaissClient(dim=4, metadata_path=str(tmp_path / "meta.json"))
+    client.upsert_many(np.eye(4, dtype="float32")[:3], [{"text": t} for t in "abc"])
+    monkeypatch.setattr(export, "get_faiss_client", lambda: client)
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+
+    app = FastAPI()
+    app.include_router(export.router)
+    with TestClient(app).stream("GET", "/export/vectors") as resp:
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        rows = [orjson.loads(line) for line in resp.iter_lines() if line]
+    assert [(r["id"], r["metadata"]["text"]) for r in rows] == [(1, "a"), (2, "b"), (3, "c")]
+    assert rows[1]["vector"] == [0.0, 1.0, 0.0, 0.0]
+
+    rows = TestClient(app).get("/export/vectors", params={"include_vectors": False}).text.splitlines()
+    assert "vector" not in orjson.loads(rows[0])
+
+
+def test_offset_tracker_commits_contiguous_prefix():
+    """Out-of-order completions only advance the commit to the first gap."""
+    from src.infra.kafka.offsets import OffsetTracker
+
+    tracker = OffsetTracker()
+    for offset in range(10, 15):
+        tracker.track("urls", 0, offset)
+    tracker.track("urls", 1, 7)
+
+    for offset in (11, 12, 14):
+        tracker.done("urls", 0, offset)
+    assert tracker.committable() == [("urls", 0, 10), ("urls", 1, 7)]
+    assert tracker.committable() == []
+
+    tracker.done("urls", 0, 10)
+    assert tracker.committable() == [("urls", 0, 13)]
+    tracker.done("urls", 0, 13)
+    tracker.done("urls", 1, 7)
+    assert sorted(tracker.committable()) == [("urls", 0, 15), ("urls", 1, 8)]
+    assert tracker.pending() == 0
+
+    tracker.forget([("urls", 0)])
+    tracker.done("urls", 0, 15)  # late completion for a revoked partition
+    assert tracker.committable() == []
+
+
+def test_reindexing_a_page_replaces_its_vectors(tmp_path, monkeypatch):
+    """Duplicate crawls of a page (retries, speculative copies) reuse its vector ids."""
+    from datetime import datetime
+    from src.common.models import ParsedPage
+    from src.infra.vector.faiss_client import FaissClient
+    from src.rag import pipeline
+
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    monkeypatch.setattr(pipeline, "_faiss_client", client)
+    page = ParsedPage(url="https://a.example/", fetched_at=datetime.utcnow(), title="t", main_text="x" * 2500)
+
+    first = pipeline.index_parsed_page(page)
+    assert pipeline.index_parsed_page(page) == first
+    assert first == [pipeline.vector_id(page.url, i) for i in range(3)]
+    assert client._index.ntotal == 3
+    client.close()
+
+
+def test_process_and_store_buffers_and_indexes_page(tmp_path, monkeypatch):
+    """A crawled page is buffered for Mongo and its chunks indexed under stable ids."""
+    from src.common.models import RawPage
+    from src.infra.vector.faiss_client import FaissClient
+    from src.processing import processor
+    from src.rag import pipeline
+
+    class FakeWriter:
+        def __init__(self):
+            self.docs = []
+
+        def add(self, doc):
+            self.docs.append(doc)
+
+    writer = FakeWriter()
+    client = FaissClient(dim=8, metadata_path=str(tmp_path / "meta.json"))
+    monkeypatch.setattr(processor, "raw_pages_writer", writer)
+    monkeypatch.setattr(pipeline, "_faiss_client", client)
+    html = "<html><head><title>T</title></head><body><p>" + "words " * 400 + "</p></body></html>"
+    raw = RawPage(url="https://a.example/p", status=200, html=html)
+
+    ids = processor.process_and_store(raw)
+
+    assert [doc["url"] for doc in writer.docs] == [raw.url]
+    assert ids and ids == [pipeline.vector_id(raw.url, i) for i in range(len(ids))]
+    assert client._index.ntotal == len(ids)
+    client.close()
+
+
+def test_crawler_pool_maps_tasks_in_order():
+    """The actor pool returns one result per task, in task order, and frees its slots."""
+    import pytest
+
+    ray = pytest.importorskip("ray")
+    from src.scraper.distributed_ray_runner import CrawlerPool
+
+    ray.init(num_cpus=2, include_dashboard=False, ignore_reinit_error=True)
+    try:
+        pool = CrawlerPool(2, max_pending_per_actor=1)
+        results = pool.map([[], [], []])
+        assert [r["status"] for r in results] == ["completed"] * 3
+        assert pool._load == [0, 0] and not pool._orphans
+        assert pool.submit([], block=False) is not None
+        pool.shutdown()
+    finally:
+        ray.shutdown()
+
+
+def test_plan_tasks_groups_by_host_and_interleaves():
+    """Tasks are small, single-host, and alternate between hosts."""
+    import pytest
+
+    pytest.importorskip("ray")
+    from src.scraper.distributed_ray_runner import plan_tasks
+
+    a = [f"http://a.example/{i}" for i in range(5)]
+    b = [f"http://b.example/{i}" for i in range(2)]
+    tasks = plan_tasks(a + b + a[:1], task_size=2)
+
+    assert tasks == [a[0:2], b, a[2:4], a[4:5]]
+
+
+def test_seed_loader_reads_url_files_and_nested_sitemaps(tmp_path):
+    """URL files skip comments; sitemap indexes are followed, gzip included."""
+    import gzip
+    from src.scraper.seed_loader import iter_seeds
+
+    ns = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+    child = tmp_path / "pages.xml.gz"
+    with gzip.open(child, "wt") as fh:
+        fh.write(f'<urlset {ns}>' + "".join(f"<url><loc>https://a.example/{i}</loc></url>" for i in range(3)) + "</urlset>")
+    index = tmp_path / "sitemap.xml"
+    index.write_text(f'<sitemapindex {ns}><sitemap><loc>{child}</loc></sitemap></sitemapindex>')
+    urls = tmp_path / "urls.txt"
+    urls.write_text("# seeds\nhttps://b.example/\n\nhttps://c.example/\n")
+
+    assert list(iter_seeds([str(urls)], [str(index)])) == [
+        "https://b.example/",
+        "https://c.example/",
+        "https://a.example/0",
+        "https://a.example/1",
+        "https://a.example/2",
+    ]
+
+
+def test_worker_routes_failures_to_retry_then_dead_letter(monkeypatch):
+    """Failed crawls go to the retry topic with a backoff, then to the DLQ."""
+    import time
+    from src.scraper import kafka_consumer_worker as worker
+
+    sent = []
+
+    def fail(payload):
+        raise RuntimeError("site down")
+
+    monkeypatch.setattr(worker, "process_url", fail)
+    monkeypatch.setattr(worker, "publish", lambda topic, payload: sent.append((topic, dict(payload))))
+    monkeypatch.setattr(worker, "WORKER_MAX_ATTEMPTS", 3)
+
+    payload = {"url": "https://slow.example/", "meta": {}}
+    outcomes = [worker.handle_message(payload) for _ in range(3)]
+
+    assert outcomes == ["retry", "retry", "dlq"]
+    assert [topic for topic, _ in sent] == [worker.RETRY_TOPIC, worker.RETRY_TOPIC, worker.DLQ_TOPIC]
+    assert sent[1][1]["_attempts"] == 2
+    assert sent[1][1]["_retry_at"] > time.time()
+    assert sent[2][1]["_error"] == "site down"
+
+
 def test_scraper_integration():
     """Test 6: Full scraper integration (requires internet)."""
     print("\n" + "="*60)
@@ -185,6 +185,344 @@ def test_book_images_spider_runs(tmp_path):
             break
     assert count >= 1
 
+
+def test_crawler_follows_requests_concurrently():
+    """The shim engine fetches start URLs in parallel and follows yielded Requests."""
+    import http.server
+    import socketserver
+    import threading
+    import time
+    from scrapy import Spider
+    from scrapy.crawler import CrawlerProcess
+
+    lock = threading.Lock()
+    in_flight, peak, log = [0], [0], []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+                log.append(("start", self.path))
+            time.sleep(0.2)
+            with lock:
+                in_flight[0] -= 1
+                log.append(("end", self.path))
+            page = int(self.path.strip("/") or 0)
+            body = f"<a href='/{page + 1}'>next</a>" if page < 2 else "last"
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    class LinkSpider(Spider):
+        def parse(self, response):
+            yield {"url": response.url}
+            if "href" in response.text:
+                yield response.follow(response.text.split("'")[1])
+
+    process = CrawlerProcess({"CONCURRENT_REQUESTS": 8, "CONCURRENT_REQUESTS_PER_DOMAIN": 8})
+    process.crawl(LinkSpider, start_urls=[f"{base}/{n}" for n in range(10, 16)] + [f"{base}/0"])
+    items = process.start()
+    server.shutdown()
+
+    urls = sorted(item["url"] for item in items)
+    assert len(urls) == 9 and f"{base}/2" in urls
+    # start pages overlap; followed pages are requested only after their parent
+    assert peak[0] > 1
+    assert log.index(("start", "/1")) > log.index(("end", "/0"))
+    assert log.index(("start", "/2")) > log.index(("end", "/1"))
+
+
+def test_pipelined_pagination_speculates_and_keeps_order():
+    """Numbered pages are prefetched in parallel but processed in order, ending
+    at the first page without a next link."""
+    import threading
+    import time
+    import requests
+    from src.scraper.spiders.pagination import iter_pages, page_template, run_pipelined
+    from src.scraper.spiders.quotes_spider import QuotesSpider
+
+    base = "https://quotes.example/"
+    last = 6
+    fetched, lock = [], threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def page_html(n):
+        nxt = f"<li class='next'><a href='/page/{n + 1}/'>Next</a></li>" if n < last else ""
+        quote = f"<div class='quote'><span class='text'>q{n}</span><small class='author'>a</small></div>"
+        return f"<html><body>{quote}<ul>{nxt}</ul></body></html>"
+
+    def fetch(url):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.1)
+        with lock:
+            in_flight[0] -= 1
+        tpl = page_template(url)
+        n = tpl[1] if tpl else 1
+        with lock:
+            fetched.append(n)
+        if n > last:
+            response = requests.Response()
+            response.status_code = 404
+            raise requests.HTTPError(response=response)
+        return page_html(n)
+
+    assert page_template("https://books.example/catalogue/page-3.html") == (
+        "https://books.example/catalogue/page-{}.html", 3)
+
+    spider = QuotesSpider(start_url=base)
+    spider.fetch = fetch
+    seen = []
+    run_pipelined(
+        iter_pages(spider.load, base, spider.next_page, window=4),
+        lambda url, doc: seen.extend(item.text for item in spider.extract_items(doc, url)),
+    )
+
+    assert seen == [f"q{n}" for n in range(1, last + 1)]
+    # page 1 serially, then 2..6 fetched in overlapping windows of at most 4
+    assert 1 < peak[0] <= 4
+    assert max(fetched) <= last + 3
+
+
+def test_image_downloader_dedups_and_revalidates(tmp_path):
+    """Identical covers are stored once (hard-linked) and a revalidating run
+    sends conditional GETs that the server answers with 304."""
+    import http.server
+    import socketserver
+    import threading
+    from src.scraper.image_downloader import ImageDownloader
+
+    bodies = {"/a.jpg": b"same-cover", "/b.jpg": b"same-cover", "/c.jpg": b"other-cover"}
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get("If-None-Match")))
+            etag = f'"{self.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(bodies[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    dl = ImageDownloader(str(tmp_path), max_workers=4)
+    futures = [dl.submit(f"{base}{p}", str(tmp_path / p.strip("/"))) for p in bodies]
+    assert dl.submit(f"{base}/a.jpg", str(tmp_path / "a.jpg")) is futures[0]
+    dl.close()
+    assert sorted(f.result() for f in futures) == sorted(str(tmp_path / p.strip("/")) for p in bodies)
+    assert os.path.samefile(tmp_path / "a.jpg", tmp_path / "b.jpg")
+    assert (tmp_path / "c.jpg").read_bytes() == b"other-cover"
+    assert len(requests_seen) == 3
+
+    requests_seen.clear()
+    dl = ImageDownloader(str(tmp_path), max_workers=4, revalidate=True)
+    dl.submit(f"{base}/c.jpg", str(tmp_path / "c.jpg")).result()
+    dl.close()
+    server.shutdown()
+    assert requests_seen == [("/c.jpg", '"/c.jpg"')]
+    assert (tmp_path / "c.jpg").read_bytes() == b"other-cover"
+
+
+def test_image_downloader_dedup_tracks_rewrites_and_existing_files(tmp_path):
+    """A revalidated cover that changed no longer serves as the canonical copy of
+    its old bytes, and covers already on disk take part in content dedup."""
+    import http.server
+    import socketserver
+    import threading
+    from src.scraper.image_downloader import ImageDownloader
+
+    bodies = {"/a.jpg": b"old-cover", "/b.jpg": b"old-cover", "/e.jpg": b"kept", "/f.jpg": b"kept"}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = f'"{bodies[self.path].decode()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(bodies[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    (tmp_path / "e.jpg").write_bytes(b"kept")
+    dl = ImageDownloader(str(tmp_path), max_workers=1)
+    for name in ("a.jpg", "e.jpg", "b.jpg", "f.jpg"):
+        dl.submit(f"{base}/{name}", str(tmp_path / name)).result()
+    dl.close()
+    assert os.path.samefile(tmp_path / "a.jpg", tmp_path / "b.jpg")
+    assert os.path.samefile(tmp_path / "e.jpg", tmp_path / "f.jpg")
+
+    bodies["/a.jpg"] = b"new-cover"
+    bodies["/d.jpg"] = b"old-cover"
+    dl = ImageDownloader(str(tmp_path), max_workers=1, revalidate=True)
+    dl.submit(f"{base}/a.jpg", str(tmp_path / "a.jpg")).result()
+    dl.submit(f"{base}/d.jpg", str(tmp_path / "d.jpg")).result()
+    dl.close()
+    server.shutdown()
+    assert (tmp_path / "a.jpg").read_bytes() == b"new-cover"
+    assert (tmp_path / "d.jpg").read_bytes() == b"old-cover"
+    assert os.path.samefile(tmp_path / "b.jpg", tmp_path / "d.jpg")
+
+
+def test_image_downloaders_share_a_directory_safely(tmp_path):
+    """Downloaders writing to one directory neither collide on temp files nor
+    drop each other's manifest entries, and each process shares one per directory."""
+    import http.server
+    import json
+    import socketserver
+    import threading
+    import time
+    from src.scraper.image_downloader import ImageDownloader, get_image_downloader
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("ETag", f'"{self.path}"')
+            self.end_headers()
+            for _ in range(5):
+                self.wfile.write(self.path.encode() * 1000)
+                time.sleep(0.02)
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    first, second = ImageDownloader(str(tmp_path)), ImageDownloader(str(tmp_path))
+    shared = [d.submit(f"{base}/c.jpg", str(tmp_path / "c.jpg")) for d in (first, second)]
+    first.submit(f"{base}/a.jpg", str(tmp_path / "a.jpg"))
+    second.submit(f"{base}/b.jpg", str(tmp_path / "b.jpg"))
+    assert [f.result() for f in shared] == [str(tmp_path / "c.jpg")] * 2
+    first.close()
+    second.close()
+    server.shutdown()
+
+    assert (tmp_path / "c.jpg").read_bytes() == b"/c.jpg" * 5000
+    assert not list(tmp_path.glob("*.part")) and not list(tmp_path.glob("*.tmp"))
+    with open(tmp_path / ".manifest.json", encoding="utf-8") as fh:
+        assert sorted(json.load(fh)) == [f"{base}/{n}.jpg" for n in "abc"]
+    assert get_image_downloader(str(tmp_path)) is get_image_downloader(str(tmp_path / "."))
+
+
+def test_parser_backends_agree_on_fixture_pages():
+    """Every installed backend extracts the same items and next link."""
+    from src.scraper.spiders.books_spider import BooksSpider
+    from src.scraper.spiders.parsers import available_backends
+    from src.scraper.spiders.quotes_spider import QuotesSpider
+
+    fixtures = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures")
+    with open(os.path.join(fixtures, "quotes_page1.html"), encoding="utf-8") as fh:
+        quotes_html = fh.read()
+    with open(os.path.join(fixtures, "books_page1.html"), encoding="utf-8") as fh:
+        books_html = fh.read()
+
+    results = {}
+    for backend in available_backends():
+        quotes = QuotesSpider(parser=backend)
+        books = BooksSpider(parser=backend, download_images=False)
+        q_doc = quotes.parser.parse(quotes_html)
+        b_doc = books.parser.parse(books_html)
+        results[backend] = (
+            [(i.text, i.author, i.tags) for i in quotes.extract_items(q_doc, "https://quotes.toscrape.com/")],
+            quotes.next_page(q_doc, "https://quotes.toscrape.com/"),
+            [(i.title, i.price, i.image_url) for i in books.extract_items(b_doc, "https://books.toscrape.com/")],
+            books.next_page(b_doc, "https://books.toscrape.com/"),
+        )
+
+    reference = results["bs4"]
+    assert len(reference[0]) == 10 and reference[0][0][1] == "Albert Einstein"
+    assert reference[1] == "https://quotes.toscrape.com/page/2/"
+    assert len(reference[2]) == 20 and reference[2][0][:2] == ("A Light in the Attic", "£51.77")
+    assert reference[3] == "https://books.toscrape.com/catalogue/page-2.html"
+    for backend, result in results.items():
+        assert result == reference, backend
+
+
+def test_crawler_reuses_a_caller_owned_client():
+    """Runs that share a loop and client keep their keep-alive connection."""
+    import asyncio
+    import http.server
+    import socketserver
+    import threading
+    from scrapy import Spider
+    from scrapy.crawler import CrawlerProcess
+
+    connections = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    class EchoSpider(Spider):
+        def parse(self, response):
+            yield {"url": response.url}
+
+    settings = {"CONCURRENT_REQUESTS": 1}
+    loop = asyncio.new_event_loop()
+    client = CrawlerProcess(settings).open_client()
+    try:
+        for n in range(3):
+            process = CrawlerProcess(settings)
+            process.crawl(EchoSpider, start_urls=[f"{base}/{n}"])
+            assert process.start(loop=loop, client=client) == [{"url": f"{base}/{n}"}]
+        assert not client.is_closed
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+        server.shutdown()
+    assert len(connections) == 1
+
+
 if __name__ == "__main__":
     success = main()
     sys.exit(0 if success else 1)